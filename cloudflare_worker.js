@@ -8,7 +8,10 @@ export default {
       if (!contentType || !contentType.includes('text/csv')) {
         return new Response('Invalid content type. Expected text/csv.', { status: 400 });
       }
-      const csvData = await request.text();
+      // Uploads are gzip-compressed by send_data_to_api.py; plain bodies still work
+      const csvData = (request.headers.get('Content-Encoding') || '').includes('gzip')
+        ? await new Response(request.body.pipeThrough(new DecompressionStream('gzip'))).text()
+        : await request.text();
       await env.TEMP_KV.put('latest_csv', csvData);
       const uploadTime =
         request.headers.get('X-Upload-Timestamp') ||
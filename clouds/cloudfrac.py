@@ -4,8 +4,12 @@ Cloud fraction orchestrator for GOES ABI products (minimal).
 
 Public API:
     - run(start, end, *, satellite="goes16", sector="F",
-          window_pixels=3, csv_path=None, site=None, verbose=True) -> pd.DataFrame
+          window_pixels=3, out_path=None, out_format=None, site=None, verbose=True,
+          lookahead=8, use_memo=True, csv_path=None) -> pd.DataFrame
+      (csv_path is a deprecated alias for out_path=..., out_format="csv")
     - dry_run(start, end, *, satellite="goes16", sector="F") -> list[str]
+    - run_scan_at_time(t, site, *, satellite, sector="F") -> (cf, cf_above)
+    - acmf_fraction_batch(paths, *, site=None) -> np.ndarray
 
 Inputs:
     start, end: str | datetime-like
@@ -24,9 +28,11 @@ Notes:
 # goes_cloud/cloudfrac.py
 from __future__ import annotations
 
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Optional, Tuple, List
 import logging
+import warnings
 import numpy as np
 import pandas as pd
 import storage
@@ -73,20 +79,6 @@ def dry_run(
         keys.extend([acmf_key, achtf_key])
     return keys
 
-# ------------------------------
-# Logging
-# ------------------------------
-logger = logging.getLogger(__name__)
-if not logger.handlers:
-    h = logging.StreamHandler()
-    h.setFormatter(
-        logging.Formatter(
-            "[%(levelname)s] %(asctime)s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S"
-        )
-    )
-    logger.addHandler(h)
-    logger.setLevel(logging.INFO)
-
 # ------------------------------
 # Key planning
 # ------------------------------
@@ -99,6 +91,12 @@ def _build_keys_for_time(t, satellite: str, sector: str) -> Tuple[str, str]:
     return acmf, achtf
 
 
+def _memo_key(product: str, t, satellite: str, sector: str, site: tools.Site) -> str:
+    """Neighborhood-memo key for one product/scan/sector/site."""
+    ts = pd.Timestamp(t).strftime("%Y-%m-%dT%H:%M")
+    return f"{satellite}|{sector}|{product}|{ts}|{site.lat:.5f},{site.lon:.5f}"
+
+
 # ------------------------------
 # Per-time runners (with internal try/except + verbose logging)
 # ------------------------------
@@ -109,26 +107,48 @@ def run_acmf_at_time(
     site: tools.Site,
     *,
     satellite: str,
+    sector: str = "F",
     verbose: bool = True,
+    prefetched: Optional[Future] = None,
+    memo: Optional[tools.NeighborhoodMemo] = None,
 ) -> float:
     """
     Ensure ACMF is cached, open it, locate the site (bilinear), and compute cloudfraction.
     Returns float in [0,1] or NaN if geometry/data are invalid.
+
+    If `prefetched` is given (a storage.prefetch future), its result is used instead
+    of downloading here. If `memo` is given, a memoized neighborhood skips the
+    download and decode; otherwise the decoded neighborhood is added to it, unless
+    the file is not the scan of t's slot (storage's hour's-latest-file fallback,
+    which may still change for a recent hour). Memo entries are keyed by `sector`
+    (the ABI sector of `acmf_key_prefix`).
     """
-    site_lat = site.lat
-    site_lon = site.lon
     # site_alt_m = site.alt_m  # unused here
+    key = _memo_key("ACMF", t, satellite, sector, site)
+    hit = memo.get(key) if memo is not None else None
+    if hit is not None:
+        return tools.cloud_fraction_from_mask(*hit)
+
     try:
-        acmf_path = storage.ensure_cached(acmf_key_prefix, satellite=satellite)
+        if prefetched is not None:
+            acmf_path = prefetched.result()
+        else:
+            acmf_path = storage.ensure_cached(acmf_key_prefix, satellite=satellite, t=t)
     except Exception as exc:
         if verbose:
             logger.warning("ACMF missing at %s (%s)", t, exc)
         return float("nan")
 
     try:
-        mask_bcm, ds = tools.open_acmf(Path(acmf_path))
-        ix_f, iy_f = tools.site_xy_fractional(ds, site_lat, site_lon)
-        neighbors_w = tools.bilinear_neighbors(ix_f, iy_f)
+        with tools.open_nc(Path(acmf_path)) as ds:
+            # Only the 2×2 patch around the site is read from disk.
+            _, _, neighbors_w = tools.site_neighbors(ds, site)
+            window, neighbors_w = tools.neighbor_window(
+                neighbors_w, (ds.sizes["y"], ds.sizes["x"])
+            )
+            mask_bcm, _ = tools.open_acmf(ds, window=window)
+        if memo is not None and storage.scan_in_slot(acmf_path, t):
+            memo.put(key, mask_bcm, neighbors_w)
         cf = tools.cloud_fraction_from_mask(mask_bcm, neighbors_w)
         return float(cf)
     except Exception as exc:
@@ -143,23 +163,38 @@ def run_achtf_at_time(
     site: tools.Site,
     *,
     satellite: str,
+    sector: str = "F",
     verbose: bool = True,
+    prefetched: Optional[Future] = None,
+    memo: Optional[tools.NeighborhoodMemo] = None,
 ) -> float:
     """
     Ensure ACHAF (or ACHA fallback) is cached, open it, and compute cloudfraction_above_site
     at the site via bilinear interpolation. Returns [0,1], 0.0 for clear/below-alt, or NaN
     if window is fully invalid/off-swath.
+
+    If `prefetched` is given (a storage.prefetch future for ACHAF), it replaces the
+    ACHAF download; the ACHA fallback is still fetched here on demand. `memo` is as
+    in run_acmf_at_time (one entry per scan, whichever height product was used).
     """
-    site_lat = site.lat
-    site_lon = site.lon
     site_alt_m = site.alt_m
 
+    key = _memo_key("HT", t, satellite, sector, site)
+    hit = memo.get(key) if memo is not None else None
+    if hit is not None:
+        cth_m, neighbors_w = hit
+        mask_like = np.where(np.isfinite(cth_m), 1.0, 0.0)
+        return tools.cloud_fraction_above_alt(cth_m, mask_like, neighbors_w, site_alt_m)
+
     # Try ACHAF then fallback to ACHA
     height_path: Optional[Path] = None
     for prod in ("ACHAF", "ACHA"):
         try:
-            pref = storage.s3_key(prod, t, satellite=satellite, sector="F")
-            p = storage.ensure_cached(pref, satellite=satellite)
+            if prod == "ACHAF" and prefetched is not None:
+                p = prefetched.result()
+            else:
+                pref = storage.s3_key(prod, t, satellite=satellite, sector="F")
+                p = storage.ensure_cached(pref, satellite=satellite, t=t)
             height_path = Path(p)
             break
         except Exception as exc:
@@ -172,10 +207,15 @@ def run_achtf_at_time(
         return float("nan")
 
     try:
-        cth_m, ds_h = tools.open_achtf(height_path)
-        # Use ACMF geometry for neighbors ideally; ACHAF aligns, but we recompute here:
-        ix_f, iy_f = tools.site_xy_fractional(ds_h, site_lat, site_lon)
-        neighbors_w = tools.bilinear_neighbors(ix_f, iy_f)
+        with tools.open_nc(height_path) as ds_h:
+            # ACHAF has its own (coarser) grid; neighbors come from the per-grid geo cache.
+            _, _, neighbors_w = tools.site_neighbors(ds_h, site)
+            window, neighbors_w = tools.neighbor_window(
+                neighbors_w, (ds_h.sizes["y"], ds_h.sizes["x"])
+            )
+            cth_m, _ = tools.open_achtf(ds_h, window=window)
+        if memo is not None and storage.scan_in_slot(height_path, t):
+            memo.put(key, cth_m, neighbors_w)
         # We still need mask to enforce "cloud present" condition. Best effort:
         # If we don't have ACMF array here, interpret “above” as (height>alt) AND height exists.
         # But to follow your definition strictly, we should also pass mask.
@@ -203,16 +243,42 @@ def run(
     *,
     satellite: str = "goes19",
     sector: str = "F",
-    csv_path: Optional[str | Path] = None,
+    out_path: Optional[str | Path] = None,
+    out_format: Optional[str] = None,
     site: Optional[tools.Site] = None,
     verbose: bool = True,
+    lookahead: int = 8,
+    use_memo: bool = True,
+    csv_path: Optional[str | Path] = None,
 ) -> pd.DataFrame:
     """
     Compute cloud fraction time series for Rubin Observatory at ~10-min cadence.
 
     Orchestrates:
-        times → keys → ACMF(cf) → (if cf>0) ACHAF(cf_above) → assemble → (optional) CSV.
+        times → keys → ACMF(cf) → (if cf>0) ACHAF(cf_above) → assemble → (optional) file.
+
+    If `out_path` is given the result is written as CSV or Parquet. `out_format`
+    ("csv" | "parquet") defaults to Parquet for a ".parquet" suffix, else CSV.
+    `csv_path` is the deprecated spelling of `out_path=..., out_format="csv"`.
+
+    Downloads are prefetched in the background up to `lookahead` scans ahead of the
+    compute loop (both ACMF and ACHAF per scan), so S3 latency overlaps with decode
+    and compute instead of stalling it.
+
+    With `use_memo` (default), decoded site neighborhoods are persisted under
+    cache_root()/neighborhoods.parquet; scans already processed are neither
+    downloaded nor decoded again on re-runs.
     """
+    if csv_path is not None:
+        if out_path is not None:
+            raise TypeError("Pass either out_path or the deprecated csv_path, not both.")
+        warnings.warn(
+            "run(csv_path=...) is deprecated; use out_path=... (out_format='csv').",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        out_path, out_format = csv_path, "csv"
+
     if verbose:
         logger.info(
             "Cloud fraction run: %s → %s | sat=%s sector=%s",
@@ -223,52 +289,161 @@ def run(
         )
 
     times = tools.list_scan_times(start, end, step_minutes=10)
-    if not times:
+    if len(times) == 0:
         raise ValueError("No timestamps produced. Check your start/end inputs.")
 
     site_obj = tools.Site.rubin_default() if site is None else site
+    n_times = len(times)
+    memo = (
+        tools.memo_neighborhood_cache(storage.cache_root() / "neighborhoods.parquet")
+        if use_memo
+        else None
+    )
 
-    rows: List[dict] = []
+    log_progress = verbose and logger.isEnabledFor(logging.INFO)
+
+    def _to_download(t: pd.Timestamp) -> Tuple[str, ...]:
+        """Products scan `t` still needs downloaded (none if the memo answers both)."""
+        hit = memo.get(_memo_key("ACMF", t, satellite, sector, site_obj)) if memo else None
+        if hit is None:
+            return ("ACMF", "ACHAF")
+        if not tools.cloud_fraction_from_mask(*hit) > 0.0:
+            return ()  # clear or unknown: no height needed
+        if memo.get(_memo_key("HT", t, satellite, sector, site_obj)) is None:
+            return ("ACHAF",)  # the ACMF memo answers cf; only the height is missing
+        return ()
+
+    def _process_one(idx: int, t: pd.Timestamp, downloads: dict) -> Tuple[float, float]:
+        if log_progress:
+            logger.info("(%d/%d) time=%s", idx, n_times, t)
+
+        # Downloads were queued by storage.prefetch
+        return run_scan_at_time(t, site_obj,
+            satellite=satellite,
+            sector=sector,
+            verbose=verbose,
+            prefetched=downloads,
+            memo=memo,
+        )
 
-    for idx, t in enumerate(times, start=1):
+    # ACHAF is requested up front with ACMF (before the cf>0 decision): it is
+    # needed often and fetching it late would put its latency back on the loop.
+    # Memoized products are not queued at all.
+    needed = {t: _to_download(t) for t in times}
+    to_fetch = times[[bool(needed[t]) for t in times]]
+    pipeline = storage.prefetch(
+        to_fetch, satellite=satellite, sector=sector, lookahead=lookahead,
+        products_for=needed.__getitem__,
+    )
+    # Fill preallocated columns by position; times are already sorted (UTC).
+    cf = np.full(n_times, np.nan, dtype=np.float64)
+    cfas = np.full(n_times, np.nan, dtype=np.float64)
+    queued = set(to_fetch)
+    try:
+        for idx, t in enumerate(times):
+            downloads = next(pipeline)[1] if t in queued else {}
+            cf[idx], cfas[idx] = _process_one(idx + 1, t, downloads)
+    finally:
+        pipeline.close()
+        if memo is not None:
+            memo.flush()
+
+    df = pd.DataFrame(
+        {
+            "timestamp": times,
+            "cloudfraction": cf,
+            "cloudfraction_above_site": cfas,
+        }
+    )
+
+    if out_path is not None:
+        is_parquet = Path(out_path).suffix.lower() == ".parquet"
+        fmt = (out_format or ("parquet" if is_parquet else "csv")).lower()
+        if fmt == "parquet":
+            tools.write_parquet(df, out_path)
+        elif fmt == "csv":
+            tools.write_csv(df, out_path)
+        else:
+            raise ValueError(f"Unsupported out_format '{fmt}' (expected 'csv' or 'parquet')")
         if verbose:
-            logger.info("(%d/%d) time=%s", idx, len(times), pd.to_datetime(t, utc=True))
+            logger.info("Wrote %s: %s", fmt, out_path)
 
-        # 2) Keys & 3) ensure local cache (keys only here; downloads happen in functions)
-        acmf_key, achtf_key = _build_keys_for_time(t, satellite, sector)
+    return df
+
+
+def run_scan_at_time(
+    t,
+    site: tools.Site,
+    *,
+    satellite: str,
+    sector: str = "F",
+    verbose: bool = True,
+    prefetched: Optional[dict] = None,
+    memo: Optional[tools.NeighborhoodMemo] = None,
+) -> Tuple[float, float]:
+    """
+    Compute (cloudfraction, cloudfraction_above_site) for one scan.
+
+    ACMF is read first; the height product is only opened when the site is
+    (partly) cloudy: NaN cloud fraction → NaN above-site, clear → 0.0. Site
+    geometry comes from the per-grid geo cache, so neither product repeats the
+    projection/bracket after the first scan on its grid.
+
+    `prefetched` is a storage.prefetch ``{product: Future}`` dict; `memo` is as in
+    run_acmf_at_time.
+    """
+    prefetched = prefetched or {}
+    acmf_key, achtf_key = _build_keys_for_time(t, satellite, sector)
+
+    cloudfraction = run_acmf_at_time(t, acmf_key, achtf_key, site,
+        satellite=satellite,
+        sector=sector,
+        verbose=verbose,
+        prefetched=prefetched.get("ACMF"),
+        memo=memo,
+    )
 
-        # Cloud fraction (ACMF)
-        cloudfraction = run_acmf_at_time(t, acmf_key, achtf_key, site_obj,
+    # Fast path logic:
+    if np.isnan(cloudfraction):
+        cloudfraction_above_site = float("nan")
+    elif cloudfraction == 0.0:
+        cloudfraction_above_site = 0.0
+    else:
+        cloudfraction_above_site = run_achtf_at_time(t, achtf_key, site,
             satellite=satellite,
+            sector=sector,
             verbose=verbose,
+            prefetched=prefetched.get("ACHAF"),
+            memo=memo,
         )
 
-        # Fast path logic:
-        if np.isnan(cloudfraction):
-            cloudfraction_above_site = float("nan")
-        elif cloudfraction == 0.0:
-            cloudfraction_above_site = 0.0
-        else:
-            cloudfraction_above_site = run_achtf_at_time(t, achtf_key, site_obj,
-                satellite=satellite,
-                verbose=verbose,
-            )
+    return float(cloudfraction), float(cloudfraction_above_site)
 
-        rows.append(
-            {
-                "timestamp": pd.to_datetime(t, utc=True),
-                "cloudfraction": float(cloudfraction),
-                "cloudfraction_above_site": float(cloudfraction_above_site)
-                if not np.isnan(cloudfraction_above_site)
-                else float("nan"),
-            }
-        )
 
-    df = pd.DataFrame(rows).sort_values("timestamp").reset_index(drop=True)
+# ------------------------------
+# Public API: batched ACMF (backfills)
+# ------------------------------
+def acmf_fraction_batch(
+    paths: List[str | Path],
+    *,
+    site: Optional[tools.Site] = None,
+) -> np.ndarray:
+    """
+    Cloud fraction for many cached ACMF files at once (e.g. an hour of scans).
+
+    All files must share one grid. The site geometry is taken from the first file
+    (geo cache), then the 2×2 patches of every file are read in a single
+    open_mfdataset pass. Returns a float array aligned with `paths`.
+    """
+    if not paths:
+        return np.empty(0, dtype=np.float64)
+    site_obj = tools.Site.rubin_default() if site is None else site
 
-    if csv_path is not None:
-        tools.write_csv(df, csv_path)
-        if verbose:
-            logger.info("Wrote CSV: %s", csv_path)
+    with tools.open_nc(Path(paths[0])) as ds:
+        _, _, neighbors_w = tools.site_neighbors(ds, site_obj)
+        window, neighbors_w = tools.neighbor_window(
+            neighbors_w, (ds.sizes["y"], ds.sizes["x"])
+        )
 
-    return df
\ No newline at end of file
+    stack = tools.open_acmf_batch([Path(p) for p in paths], window=window)
+    return tools.cloud_fraction_batch(stack, neighbors_w)
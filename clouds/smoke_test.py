@@ -19,7 +19,7 @@ df = cloudfrac.run(
     end,
     satellite="goes19",   # GOES-East (Chile has good view)
     sector="F",
-    csv_path="smoke_out.csv",
+    out_path="smoke_out.csv",
     verbose=True,
 )
 
@@ -4,7 +4,11 @@ Minimal S3 + local cache utilities for GOES ABI L2 products.
 
 - Anonymous read of public NOAA GOES buckets via s3fs
 - S3 key builder for ABI-L2 products (ACMF, ACHA/ACHA2KM)
+- Memoized per-hour listings (only the current hour is re-listed); scans resolved
+  to their 10-min slot from file names
+- On-disk negative cache for missing products (cache_root()/_negative_cache.json)
 - Local cache that mirrors S3 layout (atomic writes)
+- Background prefetch of upcoming scans (downloads overlap the caller's compute)
 
 References:
 - GOES on AWS bucket + layout: registry.opendata.aws/noaa-goes  [see cloudfrac notes]  # noqa: E501
@@ -12,10 +16,18 @@ References:
 
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+import json
 import os
+import re
 import tempfile
+import threading
+import time
 
 import fsspec  # requires s3fs installed
 
@@ -28,6 +40,15 @@ _DEFAULT_BUCKET_BY_SAT = {
     "goes19": "noaa-goes19",  # GOES-East since 2024/2025
 }
 
+# ABI full-disk scan cadence (Mode 6).
+_SCAN_MINUTES = 10
+
+# Transfer block size for S3 reads (full-disk NetCDFs are tens of MB).
+_BLOCK_SIZE = 16 * 1024 * 1024
+
+# HTTP connection pool shared by all threads (>= prefetch workers in flight).
+_MAX_POOL_CONNECTIONS = 64
+
 # Allow simple product aliases for height:
 # - "ACHAF" "ACHT" is temperature (not height).
 _PRODUCT_ALIAS = {
@@ -84,7 +105,8 @@ def s3_key(product: str, t, *, satellite: str = "goes16", sector: str = "F") ->
     - sector: keep "F" (Full Disk) for this minimal design.
 
     Notes:
-    - We do NOT list S3; we derive expected file prefix. Callers will attempt download.
+    - We do NOT list S3 here; we derive the expected hour prefix. ensure_cached()
+      resolves the concrete scan from a (memoized) listing of that prefix.
     """
     import pandas as pd
 
@@ -108,26 +130,249 @@ def local_path_for(key: str, bucket: Optional[str] = None) -> Path:
     return base / key
 
 
+@lru_cache(maxsize=None)
 def _get_fs():
     # Anonymous S3 access; public buckets do not require credentials.
-    return fsspec.filesystem("s3", anon=True)
+    # Memoized so worker threads share one s3fs session (and its connection pool).
+    # Files are read once end-to-end, so use large blocks and skip the read cache;
+    # sequential open() reads go through a readahead buffer.
+    # The connection pool is sized for the prefetch thread pool so keep-alive
+    # connections (and their TLS sessions) are reused instead of re-handshaking.
+    return fsspec.filesystem(
+        "s3",
+        anon=True,
+        default_block_size=_BLOCK_SIZE,
+        default_fill_cache=False,
+        default_cache_type="readahead",
+        config_kwargs={
+            "max_pool_connections": _MAX_POOL_CONNECTIONS,
+            "retries": {"max_attempts": 10, "mode": "standard"},
+        },
+    )
+
+# Memoized directory listings: 's3://bucket/.../HH/' → (sorted .nc URLs, listed at).
+# One LIST per hour prefix serves all scans (and products retried) in that hour.
+_LISTINGS: dict[str, tuple[tuple[str, ...], datetime]] = {}
+
+# Slot → hour's-latest-file fallbacks resolved from a final listing ((prefix, slot) → URL).
+_FALLBACKS: dict[tuple[str, datetime], str] = {}
+
+# An hour prefix stops changing once its last scan has landed: listings taken
+# this long after the hour ends are final. Before that (the current hour) a
+# memoized listing is re-taken when older than _LIST_TTL.
+_HOUR_SETTLE = timedelta(minutes=30)
+_LIST_TTL = timedelta(minutes=1)
+
+# GOES file names carry the scan start as _sYYYYDDDHHMMSSt (t = tenths of a second).
+_SCAN_START_RE = re.compile(r"_s(\d{13})\d_")
+
+# Hour prefixes end in .../<YYYY>/<DDD>/<HH>/ (see s3_key).
+_HOUR_PREFIX_RE = re.compile(r"/(\d{4})/(\d{3})/(\d{2})/$")
+
 
-def _resolve_latest_nc(prefix_url: str) -> str:
+def _utcnow() -> datetime:
+    """Current time as naive UTC datetime (the convention of this module)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _hour_settled_at(prefix_url: str) -> Optional[datetime]:
+    """Time after which no new files land under an hour prefix (None if not an hour prefix)."""
+    m = _HOUR_PREFIX_RE.search(prefix_url)
+    if m is None:
+        return None
+    start = datetime.strptime("".join(m.groups()), "%Y%j%H")
+    return start + timedelta(hours=1) + _HOUR_SETTLE
+
+
+def _is_final(prefix_url: str, listed_at: datetime) -> bool:
+    """True if a listing taken at `listed_at` can no longer change."""
+    settled = _hour_settled_at(prefix_url)
+    return settled is None or listed_at >= settled
+
+
+def _list_nc(prefix_url: str, *, refresh: bool = False) -> tuple[str, ...]:
     """
-    Given an s3://bucket/.../ prefix, find a single .nc object.
+    Return the sorted 's3://' URLs of .nc objects directly under an S3 prefix.
+
+    Listings are memoized per prefix. A final listing (see _is_final) is reused
+    for good; one of the still-filling current hour is re-taken once it is older
+    than _LIST_TTL, and a listing taken before its hour settled is re-taken once
+    after. Pass refresh=True to force a new LIST.
     """
+    if not prefix_url.endswith("/"):
+        prefix_url += "/"
+    now = _utcnow()
+    if not refresh:
+        hit = _LISTINGS.get(prefix_url)
+        if hit is not None:
+            files, listed_at = hit
+            settled = _hour_settled_at(prefix_url)
+            if _is_final(prefix_url, listed_at) or (now < settled and now - listed_at < _LIST_TTL):
+                return files
+        refresh = hit is not None  # bypass s3fs's own listing cache too
+
     fs = _get_fs()
+    try:
+        entries = fs.ls(prefix_url, detail=False, refresh=refresh)
+    except FileNotFoundError:
+        entries = []
+    # ls may return entries without 's3://' scheme — normalize
+    files = tuple(sorted(_normalize_s3_url(e) for e in entries if e.endswith(".nc")))
+    _LISTINGS[prefix_url] = (files, now)
+    return files
+
+
+def list_hour(product: str, t, *, satellite: str = "goes19", sector: str = "F") -> tuple[str, ...]:
+    """
+    List the .nc objects of one product-hour (single memoized S3 LIST).
+
+    Returns sorted 's3://bucket/key' URLs; empty if the hour has no objects.
+    """
+    bucket_name = _bucket_for(satellite)
+    key_prefix = s3_key(product, t, satellite=satellite, sector=sector)
+    return _list_nc(f"s3://{bucket_name}/{key_prefix}")
+
+
+def _scan_start(url: str) -> Optional[datetime]:
+    """Parse the scan start time (naive UTC) from a GOES file name, if present."""
+    m = _SCAN_START_RE.search(url.rsplit("/", 1)[-1])
+    if m is None:
+        return None
+    return datetime.strptime(m.group(1), "%Y%j%H%M%S")
+
+
+def scan_in_slot(path, t) -> bool:
+    """
+    True if the GOES file at `path` (local or S3) is the scan of t's 10-min slot,
+    i.e. not the hour's-latest-file fallback of _resolve_latest_nc.
+    """
+    t0 = _scan_slot(t)
+    start = _scan_start(str(path))
+    return start is not None and t0 <= start < t0 + timedelta(minutes=_SCAN_MINUTES)
+
+
+def _match_scan(files: Sequence[str], t0: datetime) -> Optional[str]:
+    """Return the latest file whose scan starts within [t0, t0 + scan cadence)."""
+    t1 = t0 + timedelta(minutes=_SCAN_MINUTES)
+    matches = [f for f in files if (s := _scan_start(f)) is not None and t0 <= s < t1]
+    return matches[-1] if matches else None
+
+
+# ---------- Negative cache (missing products) ----------
+
+# Archival scans (older than a day) that are missing stay missing; recent ones
+# may still land, so remember those only briefly.
+_NEGATIVE_ARCHIVE_AGE = timedelta(hours=24)
+_NEGATIVE_TTL_ARCHIVE = timedelta(days=7)
+_NEGATIVE_TTL_RECENT = timedelta(minutes=10)
+
+_negative_lock = threading.Lock()
+_negative: Optional[dict[str, float]] = None  # key → expiry (epoch seconds)
+
+
+def _negative_cache_path() -> Path:
+    return cache_root() / "_negative_cache.json"
+
+
+def _negative_key(prefix_url: str, t0: Optional[datetime]) -> str:
+    return prefix_url if t0 is None else f"{prefix_url}@{t0:%Y%m%dT%H%M}"
+
+
+def _load_negative() -> dict[str, float]:
+    global _negative
+    if _negative is None:
+        try:
+            _negative = json.loads(_negative_cache_path().read_text())
+        except (OSError, ValueError):
+            _negative = {}
+    return _negative
+
+
+def _is_known_missing(key: str) -> bool:
+    with _negative_lock:
+        expires = _load_negative().get(key)
+    return expires is not None and expires > time.time()
+
+
+def _remember_missing(key: str, t0: Optional[datetime]) -> None:
+    """Record a missing product and persist the cache (atomic rewrite)."""
+    now = _utcnow()
+    archival = t0 is not None and now - t0 > _NEGATIVE_ARCHIVE_AGE
+    ttl = _NEGATIVE_TTL_ARCHIVE if archival else _NEGATIVE_TTL_RECENT
+
+    with _negative_lock:
+        cache = _load_negative()
+        t_now = time.time()
+        for k in [k for k, exp in cache.items() if exp <= t_now]:
+            del cache[k]  # drop expired entries while we are rewriting anyway
+        cache[key] = t_now + ttl.total_seconds()
+
+        path = _negative_cache_path()
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(cache, fh)
+        Path(tmp_name).replace(path)
+
+
+def _scan_slot(t) -> Optional[datetime]:
+    """Scan time as naive UTC datetime (None passes through)."""
+    if t is None:
+        return None
+    import pandas as pd
+
+    return pd.to_datetime(t, utc=True).tz_localize(None).to_pydatetime()
+
+
+def _resolve_latest_nc(prefix_url: str, t=None) -> str:
+    """
+    Given an s3://bucket/.../ prefix, find a single .nc object.
+
+    Without `t`, return the latest object under the prefix (the original rule).
+    With `t`, prefer the scan that starts in t's 10-min slot: an hour prefix
+    holds six 10-min ACMF scans, and always taking the hour's latest file gave
+    every time in the hour the same xx:50 scan. Products on another cadence
+    (e.g. ACHA/ACHAF) may have no file in the slot; then the hour's latest file
+    is used, as before (scan_in_slot tells the two apart). Once the hour's
+    listing is final that fallback is memoized per (prefix, slot). Only an empty
+    hour is a miss, recorded in the on-disk negative cache.
+
+    Listings come from _list_nc, so only the current hour is ever re-listed.
+    """
     if not prefix_url.endswith("/"):
         prefix_url += "/"
-    # glob may return entries without 's3://' scheme — normalize afterwards
-    files = fs.glob(prefix_url + "*.nc")
+    t0 = _scan_slot(t)
+    fallback = _FALLBACKS.get((prefix_url, t0)) if t0 is not None else None
+    if fallback is not None:
+        return fallback
+
+    files = _list_nc(prefix_url)
     if not files:
-        raise FileNotFoundError(f"No .nc under {prefix_url}")
-    latest = sorted(files)[-1]
-    return _normalize_s3_url(latest)
+        _remember_missing(_negative_key(prefix_url, t0), t0)
+        if t0 is None:
+            raise FileNotFoundError(f"No .nc under {prefix_url}")
+        raise FileNotFoundError(f"No .nc for scan {t0:%Y-%m-%d %H:%M} under {prefix_url}")
+    if t0 is None:
+        return files[-1]
+
+    match = _match_scan(files, t0)
+    if match is not None:
+        return match
+    # No scan in this slot (different cadence or a gap): latest in the hour
+    fallback = files[-1]
+    if _is_final(prefix_url, _LISTINGS[prefix_url][1]):
+        _FALLBACKS[(prefix_url, t0)] = fallback
+    return fallback
+
+
+def _bucket_for(satellite: str | None) -> str:
+    sat = (satellite or "goes19").lower()
+    bucket_name = _DEFAULT_BUCKET_BY_SAT.get(sat)
+    if bucket_name is None:
+        raise ValueError(f"Unknown satellite '{satellite}'")
+    return bucket_name
 
 
-def ensure_cached(key_prefix: str, *, satellite: str | None = None) -> Path:
+def ensure_cached(key_prefix: str, *, satellite: str | None = None, t=None) -> Path:
     """
     Ensure the NetCDF file for the given ABI-L2 key prefix is cached locally.
 
@@ -137,6 +382,9 @@ def ensure_cached(key_prefix: str, *, satellite: str | None = None) -> Path:
         Directory-like S3 key from s3_key(...), e.g. "ABI-L2-ACMF/2025/245/21/"
     satellite : str | None
         Which satellite bucket to use (goes16/goes18/goes19). Default "goes16".
+    t : datetime-like, optional
+        Scan time; selects the scan in t's 10-min slot. Without it, the latest
+        object under the prefix is used.
 
     Returns
     -------
@@ -146,18 +394,21 @@ def ensure_cached(key_prefix: str, *, satellite: str | None = None) -> Path:
     Raises
     ------
     FileNotFoundError
-        If no .nc exists under the prefix in the bucket.
+        If no matching .nc exists under the prefix in the bucket.
     """
-    sat = (satellite or "goes19").lower()
-    bucket_name = _DEFAULT_BUCKET_BY_SAT.get(sat)
-    if bucket_name is None:
-        raise ValueError(f"Unknown satellite '{satellite}'")
+    bucket_name = _bucket_for(satellite)
 
     # Build canonical S3 prefix
     prefix_url = f"s3://{bucket_name}/{key_prefix.lstrip('/')}"
+    if not prefix_url.endswith("/"):
+        prefix_url += "/"
+
+    # Known-missing products fail fast (no S3 LIST)
+    if _is_known_missing(_negative_key(prefix_url, _scan_slot(t))):
+        raise FileNotFoundError(f"No .nc under {prefix_url} (negative cache)")
 
     # Resolve the concrete .nc object (normalized to 's3://bucket/key')
-    s3_nc_url = _resolve_latest_nc(prefix_url)
+    s3_nc_url = _resolve_latest_nc(prefix_url, t)
 
     # Compute local destination path
     bkt, rel_key = _split_s3_url(s3_nc_url)
@@ -167,15 +418,75 @@ def ensure_cached(key_prefix: str, *, satellite: str | None = None) -> Path:
     if dest.exists():
         return dest
 
-    # Atomic write: stream S3 → tmpfile → move
+    # Atomic write: S3 → tmpfile (s3fs get_file, no Python-level chunk loop) → move
     fs = _get_fs()
-    with tempfile.NamedTemporaryFile(dir=dest.parent, delete=False) as tmp:
-        with fs.open(s3_nc_url, "rb") as fsrc:
-            for chunk in iter(lambda: fsrc.read(1024 * 1024), b""):
-                tmp.write(chunk)
-        tmp.flush()
-        os.fsync(tmp.fileno())
-        tmp_path = Path(tmp.name)
+    fd, tmp_name = tempfile.mkstemp(dir=dest.parent, suffix=".part")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        fs.get_file(s3_nc_url, str(tmp_path))
+        with open(tmp_path, "rb") as fh:
+            os.fsync(fh.fileno())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
     tmp_path.replace(dest)
     return dest
+
+
+def prefetch(
+    times: Iterable,
+    *,
+    satellite: str = "goes19",
+    sector: str = "F",
+    products: Sequence[str] = ("ACMF", "ACHAF"),
+    lookahead: int = 8,
+    products_for: Optional[Callable[[object], Sequence[str]]] = None,
+) -> Iterator[Tuple[object, Dict[str, Future]]]:
+    """
+    Download products for each scan time in the background, ahead of the consumer.
+
+    Yields ``(t, {product: Future})`` in the order of `times`. Each future resolves
+    to the local path returned by ensure_cached(...) or raises its exception
+    (e.g. FileNotFoundError when the product is missing). At most `lookahead` scan
+    times are in flight at once; all products of a scan are requested together.
+    `products_for(t)`, if given, picks the products of each scan (a subset of
+    `products`) instead of all of them.
+
+    Notes:
+    - Downloads run on a private thread pool sized `lookahead * len(products)`.
+    - Closing the generator early cancels downloads that have not started yet.
+    """
+    if lookahead < 1:
+        raise ValueError(f"lookahead must be >= 1, got {lookahead}")
+
+    executor = ThreadPoolExecutor(max_workers=lookahead * len(products))
+    pending: deque = deque()
+
+    def _submit(t) -> None:
+        futures = {
+            prod: executor.submit(
+                ensure_cached,
+                s3_key(prod, t, satellite=satellite, sector=sector),
+                satellite=satellite,
+                t=t,
+            )
+            for prod in (products if products_for is None else products_for(t))
+        }
+        pending.append((t, futures))
+
+    it = iter(times)
+    try:
+        for t in it:
+            _submit(t)
+            if len(pending) >= lookahead:
+                break
+        while pending:
+            item = pending.popleft()
+            for t in it:
+                _submit(t)
+                break
+            yield item
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+
+# The cloud scripts import each other by module name (e.g. `import storage`).
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def acmf_files(tmp_path):
+    pytest.importorskip("h5py")  # h5netcdf's HDF5 backend
+    paths = []
+    for n in range(3):
+        bcm = np.zeros((4, 5), dtype=np.float32)
+        bcm[1, 2] = n % 2
+        bcm[0, 1] = np.nan
+        ds = xr.Dataset({"BCM": (("y", "x"), bcm)},
+                        coords={"x": np.arange(5.0), "y": np.arange(4.0)})
+        paths.append(tmp_path / f"acmf_{n}.nc")
+        ds.to_netcdf(paths[-1], engine="h5netcdf")
+    return paths
@@ -0,0 +1,129 @@
+import contextlib
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cloudfrac
+import storage
+import tools
+from cloudfrac import _memo_key
+
+T = pd.Timestamp("2025-01-01 03:10", tz="UTC")
+NEIGHBORS = (np.array([0, 1, 0, 1]), np.array([0, 0, 1, 1]), np.full(4, 0.25))
+
+
+def test_memo_key_separates_sectors_satellites_and_products():
+    site = tools.Site.rubin_default()
+    t = pd.Timestamp("2025-01-01 03:10:42", tz="UTC")
+    key = _memo_key("ACMF", t, "goes19", "F", site)
+
+    assert key == _memo_key("ACMF", t.floor("min"), "goes19", "F", site)
+    assert key != _memo_key("ACMF", t, "goes19", "C", site)
+    assert key != _memo_key("ACMF", t, "goes18", "F", site)
+    assert key != _memo_key("ACHTF", t, "goes19", "F", site)
+    assert key != _memo_key("ACMF", t, "goes19", "F", tools.Site(lat=-30.0, lon=-70.7366))
+
+
+def _done(result):
+    fut = Future()
+    fut.set_result(result)
+    return fut
+
+
+def _goes_name(start):
+    s = start.strftime("%Y%j%H%M%S")
+    return f"OR_ABI-L2-ACMF-M6_G19_s{s}0_e{s}9_c{s}9.nc"
+
+
+@pytest.fixture
+def fake_acmf(monkeypatch):
+    """ACMF reads that return a fully cloudy 2×2 patch without a NetCDF file."""
+    ds = SimpleNamespace(sizes={"y": 2, "x": 2})
+    monkeypatch.setattr(tools, "open_nc", lambda path: contextlib.nullcontext(ds))
+    monkeypatch.setattr(tools, "site_neighbors", lambda ds, site: (0.5, 0.5, NEIGHBORS))
+    monkeypatch.setattr(tools, "neighbor_window",
+                        lambda nb, shape: ((slice(0, 2), slice(0, 2)), nb))
+    monkeypatch.setattr(tools, "open_acmf", lambda ds, window: (np.ones((2, 2)), None))
+
+
+@pytest.mark.parametrize("scan_start, memoized", [
+    (T + pd.Timedelta(seconds=20), True),        # the scan of T's slot
+    (T + pd.Timedelta(minutes=40), False),       # the hour's latest file (fallback)
+])
+def test_acmf_fallback_results_are_not_memoized(tmp_path, fake_acmf, scan_start, memoized):
+    memo = tools.NeighborhoodMemo(tmp_path / "memo")
+    site = tools.Site.rubin_default()
+    path = tmp_path / _goes_name(scan_start)
+
+    cf = cloudfrac.run_acmf_at_time(T, "ACMF/", "ACHAF/", site, satellite="goes19",
+                                    prefetched=_done(path), memo=memo, verbose=False)
+
+    assert cf == 1.0
+    key = _memo_key("ACMF", T, "goes19", "F", site)
+    assert (memo.get(key) is not None) == memoized
+
+
+def test_run_downloads_only_products_missing_from_memo(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOES_CACHE_DIR", str(tmp_path))
+    site = tools.Site.rubin_default()
+    times = tools.list_scan_times(T, T + pd.Timedelta(minutes=30))
+    memo = tools.memo_neighborhood_cache(storage.cache_root() / "neighborhoods.parquet")
+    # t0: cloudy with height memoized; t1: cloudy, height missing; t2: clear; t3: unseen
+    for t, value in zip(times[:3], (1.0, 1.0, 0.0)):
+        memo.put(_memo_key("ACMF", t, "goes19", "F", site), np.full((2, 2), value), NEIGHBORS)
+    memo.put(_memo_key("HT", times[0], "goes19", "F", site), np.full((2, 2), 9000.0), NEIGHBORS)
+
+    requested = {}
+
+    def fake_prefetch(to_fetch, *, products_for, **kwargs):
+        for t in to_fetch:
+            requested[t] = tuple(products_for(t))
+            yield t, {}
+
+    monkeypatch.setattr(storage, "prefetch", fake_prefetch)
+    monkeypatch.setattr(cloudfrac, "run_scan_at_time", lambda t, site, **kw: (1.0, 1.0))
+    cloudfrac.run(times[0], times[-1], satellite="goes19", site=site, verbose=False)
+
+    assert requested == {times[1]: ("ACHAF",), times[3]: ("ACMF", "ACHAF")}
+
+
+def test_run_keeps_scan_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOES_CACHE_DIR", str(tmp_path))
+    times = tools.list_scan_times(T, T + pd.Timedelta(hours=1))
+    value = {t: n / 10 for n, t in enumerate(times)}
+
+    def fake_prefetch(to_fetch, **kwargs):
+        # no downloads: run_scan_at_time is faked below
+        yield from ((t, {}) for t in to_fetch)
+
+    monkeypatch.setattr(storage, "prefetch", fake_prefetch)
+    monkeypatch.setattr(cloudfrac, "run_scan_at_time",
+                        lambda t, site, **kw: (value[t], value[t] / 2))
+    df = cloudfrac.run(times[0], times[-1], satellite="goes19", verbose=False, use_memo=False)
+
+    assert list(df["timestamp"]) == list(times)
+    np.testing.assert_allclose(df["cloudfraction"], [value[t] for t in times])
+    np.testing.assert_allclose(df["cloudfraction_above_site"], [value[t] / 2 for t in times])
+
+
+@pytest.mark.parametrize("have_dask", [False, True])
+def test_acmf_fraction_batch_matches_per_file_fraction(acmf_files, monkeypatch, have_dask):
+    if have_dask:
+        pytest.importorskip("dask")
+    monkeypatch.setattr(tools, "_HAVE_DASK", have_dask)
+    # the site straddles the cloudy pixel (2, 1) and the NaN at (1, 0)
+    neighbors = (np.array([1, 2, 1, 2]), np.array([0, 0, 1, 1]), np.array([0.1, 0.2, 0.3, 0.4]))
+    monkeypatch.setattr(tools, "site_neighbors", lambda ds, site: (1.5, 0.5, neighbors))
+
+    out = cloudfrac.acmf_fraction_batch(acmf_files)
+
+    expected = []
+    for path in acmf_files:
+        with tools.open_nc(path) as ds:
+            expected.append(tools.cloud_fraction_from_mask(tools.open_acmf(ds)[0], neighbors))
+    np.testing.assert_allclose(out, expected)
+    assert np.isfinite(out).all() and out[0] != out[1]
+    assert cloudfrac.acmf_fraction_batch([]).shape == (0,)
@@ -0,0 +1,229 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import storage
+
+PREFIX = "s3://noaa-goes19/ABI-L2-ACMF/2025/001/12/"
+HOUR_END = datetime(2025, 1, 1, 13, 0)
+
+
+def _goes_url(start: datetime, product="ACMF") -> str:
+    s = start.strftime("%Y%j%H%M%S")
+    return f"{PREFIX}OR_ABI-L2-{product}-M6_G19_s{s}0_e{s}9_c{s}9.nc"
+
+
+class _FakeFS:
+    """s3fs stand-in: `objects` is what the bucket holds now; counts LIST calls."""
+
+    def __init__(self, objects=()):
+        self.objects = list(objects)
+        self.n_ls = 0
+
+    def ls(self, prefix, detail=False, refresh=False):
+        self.n_ls += 1
+        return [o.replace("s3://", "") for o in self.objects if o.startswith(prefix)]
+
+
+@pytest.fixture
+def fake_s3(tmp_path, monkeypatch):
+    fs = _FakeFS()
+    clock = {"now": HOUR_END + timedelta(days=2)}
+    monkeypatch.setenv("GOES_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "_get_fs", lambda: fs)
+    monkeypatch.setattr(storage, "_utcnow", lambda: clock["now"])
+    monkeypatch.setattr(storage, "_LISTINGS", {})
+    monkeypatch.setattr(storage, "_FALLBACKS", {})
+    monkeypatch.setattr(storage, "_negative", None)
+    return fs, clock
+
+
+def test_match_scan_picks_the_slot_scan():
+    files = [_goes_url(datetime(2025, 1, 1, 12, m, 20)) for m in (0, 10, 20)]
+    assert storage._match_scan(files, datetime(2025, 1, 1, 12, 10)) == files[1]
+    assert storage._match_scan(files, datetime(2025, 1, 1, 12, 30)) is None
+    assert storage._match_scan(["s3://b/no_scan_time.nc"], datetime(2025, 1, 1, 12, 0)) is None
+
+
+def test_scan_in_slot():
+    url = _goes_url(datetime(2025, 1, 1, 12, 10, 20))
+    assert storage.scan_in_slot(url, "2025-01-01T12:10:00Z")
+    assert not storage.scan_in_slot(url, "2025-01-01T12:00:00Z")
+    assert not storage.scan_in_slot(url, "2025-01-01T12:20:00Z")
+    assert not storage.scan_in_slot("/cache/no_scan_time.nc", "2025-01-01T12:10:00Z")
+
+
+def test_completed_hour_is_listed_once_and_fallback_memoized(fake_s3):
+    fs, _ = fake_s3
+    fs.objects = [_goes_url(datetime(2025, 1, 1, 12, m, 20)) for m in (0, 10)]
+
+    assert storage._resolve_latest_nc(PREFIX, "2025-01-01T12:00Z") == fs.objects[0]
+    # no scan in the 12:30 slot: hour's latest file, memoized per slot
+    assert storage._resolve_latest_nc(PREFIX, "2025-01-01T12:30Z") == fs.objects[1]
+    assert storage._resolve_latest_nc(PREFIX, "2025-01-01T12:30Z") == fs.objects[1]
+    assert storage._resolve_latest_nc(PREFIX) == fs.objects[1]
+    assert fs.n_ls == 1
+    assert (PREFIX, datetime(2025, 1, 1, 12, 30)) in storage._FALLBACKS
+
+
+def test_current_hour_is_relisted_after_ttl(fake_s3):
+    fs, clock = fake_s3
+    clock["now"] = datetime(2025, 1, 1, 12, 15)
+    fs.objects = [_goes_url(datetime(2025, 1, 1, 12, 0, 20))]
+
+    assert storage._resolve_latest_nc(PREFIX, "2025-01-01T12:10Z") == fs.objects[0]
+    assert storage._FALLBACKS == {}  # still filling: fallback not memoized
+
+    fs.objects.append(_goes_url(datetime(2025, 1, 1, 12, 10, 20)))
+    assert storage._resolve_latest_nc(PREFIX, "2025-01-01T12:10Z") == fs.objects[0]
+    assert fs.n_ls == 1  # within the TTL the memoized listing is used
+
+    clock["now"] += storage._LIST_TTL
+    assert storage._resolve_latest_nc(PREFIX, "2025-01-01T12:10Z") == fs.objects[1]
+    assert storage._resolve_latest_nc(PREFIX) == fs.objects[1]
+    assert fs.n_ls == 2
+
+
+def test_listing_taken_while_filling_is_retaken_once_settled(fake_s3):
+    fs, clock = fake_s3
+    clock["now"] = datetime(2025, 1, 1, 12, 55)
+    fs.objects = [_goes_url(datetime(2025, 1, 1, 12, 0, 20))]
+    assert storage._resolve_latest_nc(PREFIX) == fs.objects[0]
+
+    fs.objects.append(_goes_url(datetime(2025, 1, 1, 12, 50, 20)))
+    clock["now"] = HOUR_END + storage._HOUR_SETTLE
+    assert storage._resolve_latest_nc(PREFIX) == fs.objects[1]
+    clock["now"] += timedelta(hours=5)
+    assert storage._resolve_latest_nc(PREFIX) == fs.objects[1]
+    assert fs.n_ls == 2
+
+
+def test_empty_hour_is_a_miss(fake_s3):
+    fs, _ = fake_s3
+    with pytest.raises(FileNotFoundError):
+        storage._resolve_latest_nc(PREFIX, "2025-01-01T12:10Z")
+    assert storage._is_known_missing(storage._negative_key(PREFIX, datetime(2025, 1, 1, 12, 10)))
+
+
+def test_threads_share_one_filesystem():
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        filesystems = list(ex.map(lambda _: storage._get_fs(), range(8)))
+    assert all(fs is filesystems[0] for fs in filesystems)
+
+
+@pytest.fixture
+def fake_downloads(monkeypatch):
+    """ensure_cached stand-in that records calls and the peak number in flight."""
+    state = {"calls": [], "in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_ensure_cached(key_prefix, *, satellite=None, t=None):
+        with lock:
+            state["calls"].append((key_prefix.split("/")[0], t))
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.01)
+        with lock:
+            state["in_flight"] -= 1
+        if t == "missing":
+            raise FileNotFoundError(t)
+        return f"/cache/{key_prefix}{t}"
+
+    monkeypatch.setattr(storage, "ensure_cached", fake_ensure_cached)
+    monkeypatch.setattr(storage, "s3_key", lambda prod, t, **kw: f"{prod}/")
+    return state
+
+
+def test_prefetch_yields_in_order_within_lookahead(fake_downloads):
+    times = [f"t{n}" for n in range(10)]
+    seen = []
+    for t, futures in storage.prefetch(times, lookahead=2):
+        assert set(futures) == {"ACMF", "ACHAF"}
+        assert futures["ACMF"].result() == f"/cache/ACMF/{t}"
+        seen.append(t)
+
+    assert seen == times
+    assert len(fake_downloads["calls"]) == 20
+    assert fake_downloads["peak"] <= 2 * 2  # lookahead scans x products
+
+
+def test_prefetch_futures_carry_errors_and_products_for(fake_downloads):
+    pipeline = storage.prefetch(["missing", "t1"], lookahead=1,
+                                products_for=lambda t: ("ACHAF",) if t == "t1" else ("ACMF",))
+    t, futures = next(pipeline)
+    assert t == "missing"
+    with pytest.raises(FileNotFoundError):
+        futures["ACMF"].result()
+    t, futures = next(pipeline)
+    assert (t, list(futures)) == ("t1", ["ACHAF"])
+    pipeline.close()
+
+
+def test_prefetch_rejects_empty_lookahead():
+    with pytest.raises(ValueError):
+        next(storage.prefetch(["t0"], lookahead=0))
+
+
+@pytest.fixture
+def negative_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOES_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "_negative", None)
+    clock = {"now": 1_000_000.0}
+    monkeypatch.setattr(storage.time, "time", lambda: clock["now"])
+    return clock
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_negative_key_includes_the_slot():
+    t0 = datetime(2025, 1, 1, 3, 10)
+    assert storage._negative_key("s3://bucket/p/", None) == "s3://bucket/p/"
+    assert storage._negative_key("s3://bucket/p/", t0) == "s3://bucket/p/@20250101T0310"
+
+
+def test_recent_miss_expires_after_short_ttl(negative_cache):
+    key = storage._negative_key("s3://bucket/recent/", _utcnow())
+    storage._remember_missing(key, _utcnow())
+    assert storage._is_known_missing(key)
+
+    negative_cache["now"] += storage._NEGATIVE_TTL_RECENT.total_seconds() + 1
+    assert not storage._is_known_missing(key)
+
+
+def test_archival_miss_is_kept_for_long_ttl(negative_cache):
+    t0 = _utcnow() - storage._NEGATIVE_ARCHIVE_AGE - timedelta(hours=1)
+    key = storage._negative_key("s3://bucket/old/", t0)
+    storage._remember_missing(key, t0)
+
+    negative_cache["now"] += storage._NEGATIVE_TTL_RECENT.total_seconds() + 1
+    assert storage._is_known_missing(key)
+    negative_cache["now"] += storage._NEGATIVE_TTL_ARCHIVE.total_seconds()
+    assert not storage._is_known_missing(key)
+
+
+def test_negative_cache_persists_and_drops_expired_entries(negative_cache, monkeypatch):
+    stale = storage._negative_key("s3://bucket/stale/", None)
+    storage._remember_missing(stale, None)
+    negative_cache["now"] += storage._NEGATIVE_TTL_RECENT.total_seconds() + 1
+    fresh = storage._negative_key("s3://bucket/fresh/", None)
+    storage._remember_missing(fresh, None)
+
+    # a new process reloads the file written above
+    monkeypatch.setattr(storage, "_negative", None)
+    assert storage._is_known_missing(fresh)
+    assert stale not in storage._load_negative()
+
+
+def test_known_missing_scan_fails_without_listing(fake_s3):
+    fs, _ = fake_s3
+    key_prefix = PREFIX.split("noaa-goes19/", 1)[1]
+    with pytest.raises(FileNotFoundError):
+        storage.ensure_cached(key_prefix, satellite="goes19", t="2025-01-01T12:10Z")
+    with pytest.raises(FileNotFoundError, match="negative cache"):
+        storage.ensure_cached(key_prefix, satellite="goes19", t="2025-01-01T12:10Z")
+    assert fs.n_ls == 1
@@ -0,0 +1,144 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import tools
+
+
+def _neighbors(w=(0.4, 0.3, 0.2, 0.1)):
+    return (np.array([1, 2, 1, 2], dtype=np.intp), np.array([0, 0, 1, 1], dtype=np.intp),
+            np.array(w, dtype=np.float64))
+
+
+def test_neighborhood_memo_round_trip(tmp_path):
+    patch = np.array([[0.0, 1.0, 1.0], [0.0, np.nan, 0.0]])
+    neighbors = _neighbors()
+    memo = tools.NeighborhoodMemo(tmp_path / "memo")
+    memo.put("k", patch, neighbors)
+    memo.flush()
+
+    reloaded = tools.NeighborhoodMemo(tmp_path / "memo")
+    hit = reloaded.get("k")
+    assert hit is not None
+    assert reloaded.get("other") is None
+    assert tools.cloud_fraction_from_mask(*hit) == tools.cloud_fraction_from_mask(patch, neighbors)
+    assert set(pq.read_schema(next((tmp_path / "memo").glob("*.parquet"))).names) == set(
+        tools._memo_columns())
+
+
+def test_neighborhood_memo_compacts_parts(tmp_path):
+    root = tmp_path / "memo"
+    patch = np.ones((2, 3))
+    for n in range(tools._MEMO_MAX_PARTS + 1):
+        memo = tools.NeighborhoodMemo(root)
+        memo.put(f"k{n % 4}", patch * n, _neighbors())
+        memo.flush()
+
+    assert len(list(root.glob("*.parquet"))) == 1
+    memo = tools.NeighborhoodMemo(root)
+    # latest write of each key wins
+    assert memo.get("k0")[0][0, 0] == tools._MEMO_MAX_PARTS
+    assert memo.get("k3")[0][0, 0] == tools._MEMO_MAX_PARTS - 1
+
+
+def test_neighborhood_memo_reads_parts_with_grid_origin(tmp_path):
+    # parts written before the (unused) i0/j0 columns were dropped
+    root = tmp_path / "memo"
+    root.mkdir()
+    cols = {"key": pa.array(["old"]).dictionary_encode(),
+            "i0": pa.array([5], type=pa.int32()), "j0": pa.array([7], type=pa.int32())}
+    cols.update({f"v{c}": [1.0] for c in tools._MEMO_CORNERS})
+    cols.update({f"w{c}": [0.25] for c in tools._MEMO_CORNERS})
+    pq.write_table(pa.table(cols), root / "part-0-0.parquet")
+
+    memo = tools.NeighborhoodMemo(root)
+    assert tools.cloud_fraction_from_mask(*memo.get("old")) == 1.0
+    for n in range(tools._MEMO_MAX_PARTS):
+        memo.put(f"new{n}", np.zeros((2, 3)), _neighbors())
+        memo.flush()
+    assert len(list(root.glob("*.parquet"))) == 1
+    assert tools.cloud_fraction_from_mask(*tools.NeighborhoodMemo(root).get("old")) == 1.0
+
+
+@pytest.mark.parametrize("have_dask", [False, True])
+def test_open_acmf_batch_matches_per_file_reads(acmf_files, monkeypatch, have_dask):
+    if have_dask:
+        pytest.importorskip("dask")
+    monkeypatch.setattr(tools, "_HAVE_DASK", have_dask)
+    window = (slice(1, 3), slice(0, 2))
+
+    stack = tools.open_acmf_batch(acmf_files, window=window)
+
+    assert stack.shape == (3, 2, 2)
+    for n, path in enumerate(acmf_files):
+        with tools.open_nc(path) as ds:
+            np.testing.assert_array_equal(stack[n], tools.open_acmf(ds, window=window)[0])
+
+
+# Loops of the original (pre-numba) kernels, as the reference implementation.
+def _reference_cf(mask, neighbors):
+    num = den = 0.0
+    H, W = mask.shape
+    for i, j, w in zip(*neighbors):
+        if w <= 0 or not (0 <= j < H and 0 <= i < W):
+            continue
+        m = mask[j, i]
+        if np.isfinite(m):
+            num += (1.0 if m != 0 else 0.0) * w
+            den += w
+    return float("nan") if den == 0.0 else num / den
+
+
+def _reference_cf_above(cth, mask, neighbors, site_alt_m):
+    num = den = 0.0
+    H, W = mask.shape
+    for i, j, w in zip(*neighbors):
+        if w <= 0 or not (0 <= j < H and 0 <= i < W):
+            continue
+        m, h = mask[j, i], cth[j, i]
+        if not (np.isfinite(m) and np.isfinite(h)):
+            continue
+        den += w
+        if m != 0 and h > site_alt_m:
+            num += w
+    return float("nan") if den == 0.0 else num / den
+
+
+def _random_cases(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        mask = rng.choice([0.0, 1.0, 255.0, np.nan], size=(3, 3))
+        cth = rng.choice([1000.0, 2660.0, 5000.0, np.nan], size=(3, 3))
+        i0, j0 = rng.integers(-1, 3, size=2)   # corners may fall off the grid
+        w = rng.dirichlet(np.ones(4)) * rng.choice([1.0, 0.0], size=4, p=[0.8, 0.2])
+        neighbors = (np.array([i0, i0 + 1, i0, i0 + 1], dtype=np.intp),
+                     np.array([j0, j0, j0 + 1, j0 + 1], dtype=np.intp), w)
+        yield mask, cth, neighbors
+
+
+@pytest.mark.parametrize("jit", [True, False])
+def test_fraction_kernels_match_the_reference_loops(jit, monkeypatch):
+    if not jit:
+        # numba-compiled functions keep the Python original as .py_func
+        for name in ("_cf_from_mask_kernel", "_cf_above_kernel"):
+            kernel = getattr(tools, name)
+            monkeypatch.setattr(tools, name, getattr(kernel, "py_func", kernel))
+    for mask, cth, neighbors in _random_cases():
+        np.testing.assert_equal(tools.cloud_fraction_from_mask(mask, neighbors),
+                                _reference_cf(mask, neighbors))
+        np.testing.assert_equal(tools.cloud_fraction_above_alt(cth, mask, neighbors, 2660.0),
+                                _reference_cf_above(cth, mask, neighbors, 2660.0))
+
+
+def test_cloud_fraction_batch_matches_per_scan_fraction():
+    cases = list(_random_cases(n=50, seed=2))
+    for _, _, neighbors in cases:
+        stack = np.stack([mask for mask, _, _ in cases])
+        expected = [tools.cloud_fraction_from_mask(mask, neighbors) for mask in stack]
+        np.testing.assert_array_equal(tools.cloud_fraction_batch(stack, neighbors), expected)
+
+
+def test_cloud_fraction_batch_off_grid_window_is_nan():
+    out = tools.cloud_fraction_batch(np.empty((3, 0, 0)), _neighbors())
+    assert out.shape == (3,) and np.isnan(out).all()
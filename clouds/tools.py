@@ -3,10 +3,14 @@
 Minimal utilities for GOES cloud fraction sampling at the Rubin Observatory.
 
 - Time helpers: 10-min UTC schedule
-- Readers: ACMF (binary cloud mask), ACHAF/ACHA (cloud-top height)
+- Readers: ACMF (binary cloud mask), ACHAF/ACHA (cloud-top height); batched
+  ACMF reads for many scans at once (open_mfdataset)
 - Geo: GOES fixed-grid CRS; fractional pixel lookup; bilinear neighbors
-- Compute: weighted (bilinear) fractions at the site
-- I/O: CSV writer
+  (cached per grid + site, since they do not change between scans)
+- Compute: weighted (bilinear) fractions at the site (numba kernels if installed);
+  a vectorized variant for stacks of scans on one grid
+- Memo: decoded 2×2 site neighborhoods persisted as Parquet (skips re-decoding)
+- I/O: CSV and Parquet writers
 
 Design notes:
 - We interpolate at the exact site location using bilinear weights over the 2×2
@@ -19,6 +23,8 @@ Design notes:
 
 from __future__ import annotations
 
+import os
+import time
 from pathlib import Path
 from typing import Any, List, Sequence, Tuple
 
@@ -28,6 +34,25 @@ import xarray as xr
 from pyproj import CRS, Transformer
 from dataclasses import dataclass
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; kernels then run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+try:
+    import dask  # noqa: F401  (backs xr.open_mfdataset)
+    _HAVE_DASK = True
+except ImportError:  # dask is optional; open_acmf_batch then opens files one by one
+    _HAVE_DASK = False
+
+# 2×2 bilinear neighborhood: (idx_i, idx_j, w), each a length-4 array.
+Neighbors = Tuple[np.ndarray, np.ndarray, np.ndarray]
+# (x, y) slices into an image.
+Window = Tuple[slice, slice]
+
 # ---------------------------------------------------------------------
 # Site constants (Rubin Observatory, Cerro Pachón)
 # ---------------------------------------------------------------------
@@ -48,12 +73,13 @@ class Site:
 # ---------------------------------------------------------------------
 
 
-def list_scan_times(start, end, step_minutes: int = 10) -> List[pd.Timestamp]:
+def list_scan_times(start, end, step_minutes: int = 10) -> pd.DatetimeIndex:
     """
     Return timestamps snapped to `step_minutes` boundaries in UTC.
     Inclusive of both start and end boundaries after snapping.
 
-    We do a simple floor on `start` and generate a fixed-frequency range.
+    We do a simple floor on `start` and generate a fixed-frequency range. The
+    result is a tz-aware (UTC), monotonically increasing DatetimeIndex.
     """
     t0 = pd.to_datetime(start, utc=True)
     t1 = pd.to_datetime(end, utc=True)
@@ -62,8 +88,7 @@ def list_scan_times(start, end, step_minutes: int = 10) -> List[pd.Timestamp]:
 
     step = pd.Timedelta(minutes=step_minutes)
     t0 = t0.floor(f"{step_minutes}min")
-    times = pd.date_range(start=t0, end=t1, freq=step, tz="UTC")
-    return list(times)
+    return pd.date_range(start=t0, end=t1, freq=step, tz="UTC")
 
 
 # ---------------------------------------------------------------------
@@ -71,15 +96,56 @@ def list_scan_times(start, end, step_minutes: int = 10) -> List[pd.Timestamp]:
 # ---------------------------------------------------------------------
 
 
-def _open_nc(path: Path) -> xr.Dataset:
+def open_nc(path: Path) -> xr.Dataset:
+    """
+    Open a GOES L2 NetCDF lazily; variables are only read when accessed.
+
+    GOES L2 files are NetCDF4/HDF5, so the pure-HDF5 h5netcdf engine reads them
+    without the netCDF-C stack (requires h5netcdf installed).
+    """
     # Rely on xarray to apply scale/offset and masks.
-    return xr.open_dataset(path, mask_and_scale=True, decode_times=True)
+    return xr.open_dataset(path, engine="h5netcdf", mask_and_scale=True, decode_times=True)
+
+
+def _as_dataset(source: Path | xr.Dataset) -> xr.Dataset:
+    return source if isinstance(source, xr.Dataset) else open_nc(Path(source))
+
+
+def _source_name(ds: xr.Dataset) -> str:
+    return Path(ds.encoding.get("source", "dataset")).name
+
+
+def neighbor_window(neighbors: Neighbors, shape: tuple[int, int]) -> tuple[Window, Neighbors]:
+    """
+    Return the (x, y) slices covering `neighbors` and the neighbors re-indexed
+    relative to that window.
+
+    Reading only the window (a 2×2 patch) instead of the full-disk image keeps
+    per-scan I/O at a few bytes. Out-of-bounds neighbors stay out of bounds in
+    window coordinates, so the fraction kernels still drop them.
+    """
+    idx_i, idx_j, w = neighbors
+    H, W = shape
+    i0 = int(np.clip(idx_i.min(), 0, W))
+    i1 = int(np.clip(idx_i.max() + 1, i0, W))
+    j0 = int(np.clip(idx_j.min(), 0, H))
+    j1 = int(np.clip(idx_j.max() + 1, j0, H))
+    return (slice(i0, i1), slice(j0, j1)), (idx_i - i0, idx_j - j0, w)
 
 
-def open_acmf(path: Path) -> tuple[np.ndarray, xr.Dataset]:
+def open_acmf(
+    source: Path | xr.Dataset, *, window: Window | None = None
+) -> tuple[np.ndarray, xr.Dataset]:
     """
     Open ACMF (Cloud/Clear-Sky Mask) and return (binary_cloud_mask, dataset).
 
+    Parameters
+    ----------
+    source : Path | xr.Dataset
+        File path, or a dataset already opened with open_nc().
+    window : (slice, slice), optional
+        (x, y) slices to read (see neighbor_window); default is the full image.
+
     Returns
     -------
     binary_cloud_mask : np.ndarray (float64)
@@ -92,35 +158,83 @@ def open_acmf(path: Path) -> tuple[np.ndarray, xr.Dataset]:
     Public ACMF typically provides a Binary Cloud Mask (BCM).
     We normalize common encodings: {0,1}, {0,255}, or nonzero/zero bitfields.
     """
-    ds = _open_nc(path)
+    ds = _as_dataset(source)
+
+    da = ds[_acmf_var(ds)]
+    if window is not None:
+        da = da.isel(x=window[0], y=window[1])
+    arr = da.values  # keep NaNs
+    return _normalize_bcm(arr), ds
 
+
+def _acmf_var(ds: xr.Dataset) -> str:
     var_candidates = ["BCM", "Binary_Cloud_Mask", "Cloud_Mask", "cloud_mask", "mask"]
     var_name = next((v for v in var_candidates if v in ds.data_vars), None)
     if var_name is None:
-        raise KeyError(f"No expected cloud mask variable found in {path.name}")
+        raise KeyError(f"No expected cloud mask variable found in {_source_name(ds)}")
+    return var_name
 
-    da = ds[var_name]
-    arr = da.values  # keep NaNs
-    bcm = np.full(arr.shape, np.nan, dtype="float64")
 
-    finite = np.isfinite(arr)
-    uniq = np.unique(arr[finite])
+def _normalize_bcm(arr: np.ndarray) -> np.ndarray:
+    """
+    Map a raw cloud mask to float64: 1 = cloudy, 0 = clear, NaN = missing.
 
-    if set(uniq.tolist()).issubset({0, 1}):
-        bcm[finite] = arr[finite]
-    elif set(uniq.tolist()).issubset({0, 255}):
-        bcm[finite] = (arr[finite] == 255).astype("float64")
-    else:
-        # Fallback: any nonzero value means "cloudy"
-        bcm[finite] = (arr[finite] != 0).astype("float64")
+    The {0,1}, {0,255} and nonzero-bitfield encodings all reduce to "nonzero means
+    cloudy", so no encoding detection (e.g. np.unique over the image) is needed.
+    """
+    return np.where(np.isfinite(arr), (arr != 0).astype("float64"), np.nan)
 
-    return bcm, ds
 
+def open_acmf_batch(
+    paths: Sequence[Path], *, window: Window | None = None
+) -> np.ndarray:
+    """
+    Open several ACMF files in one pass and return the stacked mask, shape (T, H, W).
 
-def open_achtf(path: Path) -> tuple[np.ndarray, xr.Dataset]:
+    With dask installed, files are opened with xr.open_mfdataset (parallel opens)
+    and concatenated along a new "time" axis in the order given; without it they
+    are opened one after another with open_nc. Only the mask variable, cut to
+    `window` when given, is kept from each file. All files must share one grid
+    (same satellite/sector). Values are normalized as in open_acmf.
+    """
+    def _select(ds: xr.Dataset) -> xr.Dataset:
+        da = ds[_acmf_var(ds)]
+        if window is not None:
+            da = da.isel(x=window[0], y=window[1])
+        return da.rename("BCM").to_dataset()
+
+    if not _HAVE_DASK:
+        masks = []
+        for p in paths:
+            with open_nc(Path(p)) as ds:
+                masks.append(_select(ds)["BCM"].values)
+        return _normalize_bcm(np.stack(masks))
+
+    with xr.open_mfdataset(
+        [Path(p) for p in paths],
+        engine="h5netcdf",
+        combine="nested",
+        concat_dim="time",
+        parallel=True,
+        preprocess=_select,
+        chunks={"x": 1024, "y": 1024},
+        mask_and_scale=True,
+        data_vars="all",  # BCM gains the new "time" axis
+        coords="minimal",
+        compat="override",
+    ) as ds:
+        arr = ds["BCM"].values
+    return _normalize_bcm(arr)
+
+
+def open_achtf(
+    source: Path | xr.Dataset, *, window: Window | None = None
+) -> tuple[np.ndarray, xr.Dataset]:
     """
     Open Cloud-Top Height (ACHAF/ACHA) and return (cth_m, dataset).
 
+    `source` and `window` are as in open_acmf.
+
     Returns
     -------
     cth_m : np.ndarray (float64)
@@ -128,7 +242,7 @@ def open_achtf(path: Path) -> tuple[np.ndarray, xr.Dataset]:
     dataset : xr.Dataset
         The dataset for metadata, coords, and projection attrs.
     """
-    ds = _open_nc(path)
+    ds = _as_dataset(source)
 
     # Common variable names seen in ACHAF/ACHA
     candidates = [
@@ -148,9 +262,11 @@ def open_achtf(path: Path) -> tuple[np.ndarray, xr.Dataset]:
                 var_name = v
                 break
     if var_name is None:
-        raise KeyError(f"No cloud-top height variable found in {path.name}")
+        raise KeyError(f"No cloud-top height variable found in {_source_name(ds)}")
 
     da = ds[var_name]
+    if window is not None:
+        da = da.isel(x=window[0], y=window[1])
     cth = da.astype("float64").values  # apply mask/scale
 
     units = str(da.attrs.get("units", "")).lower()
@@ -167,25 +283,29 @@ def open_achtf(path: Path) -> tuple[np.ndarray, xr.Dataset]:
 # ---------------------------------------------------------------------
 
 
+def _projection_attrs(ds: xr.Dataset) -> dict:
+    """Return the attrs of the GOES fixed-grid projection variable."""
+    # Locate the projection attrs
+    if "goes_imager_projection" in ds:
+        return ds["goes_imager_projection"].attrs
+    # Find any var that references the mapping via 'grid_mapping'
+    gvar = None
+    for v in ds.data_vars:
+        if ds[v].attrs.get("grid_mapping", "") == "goes_imager_projection":
+            gvar = v
+            break
+    if gvar is None or "goes_imager_projection" not in ds:
+        raise KeyError("goes_imager_projection not found in dataset.")
+    return ds["goes_imager_projection"].attrs
+
+
 def _crs_from_meta(ds: xr.Dataset) -> tuple[CRS, float]:
     """
     Build a pyproj CRS for the GOES GEOS projection and return (CRS, H).
 
     H = perspective_point_height (meters).
     """
-    # Locate the projection attrs
-    if "goes_imager_projection" in ds:
-        g = ds["goes_imager_projection"].attrs
-    else:
-        # Find any var that references the mapping via 'grid_mapping'
-        gvar = None
-        for v in ds.data_vars:
-            if ds[v].attrs.get("grid_mapping", "") == "goes_imager_projection":
-                gvar = v
-                break
-        if gvar is None or "goes_imager_projection" not in ds:
-            raise KeyError("goes_imager_projection not found in dataset.")
-        g = ds["goes_imager_projection"].attrs
+    g = _projection_attrs(ds)
 
     h = float(g["perspective_point_height"])
     lon0 = float(g["longitude_of_projection_origin"])
@@ -207,7 +327,8 @@ def site_xy_fractional(ds: xr.Dataset, lat: float, lon: float) -> tuple[float, f
     Handles the common case where dataset coords ('x','y') are scan angles in radians:
     - We project lon/lat → (X,Y) meters (GEOS).
     - Convert to angles: x_ang = atan(X/H), y_ang = atan(Y/H) using H from metadata.
-    - Then bracket against ds['x'] and ds['y'] (which may be ascending or descending).
+    - Then bracket against ds['x'] and ds['y'] (which may be ascending or descending);
+      uniformly spaced axes are bracketed arithmetically, others by binary search.
     """
     if ("x" not in ds.coords) or ("y" not in ds.coords):
         raise KeyError("Dataset lacks 'x' and/or 'y' coordinates.")
@@ -233,15 +354,25 @@ def site_xy_fractional(ds: xr.Dataset, lat: float, lon: float) -> tuple[float, f
         Yq = Y_m
 
     def _bracket(axis_vals: np.ndarray, value: float) -> tuple[int, int, float]:
-        ascending = axis_vals[-1] > axis_vals[0]
-        if ascending:
-            i1 = int(np.searchsorted(axis_vals, value, side="left"))
+        n = len(axis_vals)
+        # Uniform axis (the GOES fixed grid): the first steps and the mean step
+        # agree, so the cell index is arithmetic instead of a binary search.
+        step = np.diff(axis_vals[:4])
+        dv = float(step[0]) if n > 1 else 0.0
+        mean_dv = float(axis_vals[-1] - axis_vals[0]) / max(n - 1, 1)
+        tol = 1e-6 * abs(dv)
+        if dv != 0.0 and np.ptp(step) <= tol and abs(mean_dv - dv) <= tol:
+            i0 = int(np.floor((value - float(axis_vals[0])) / dv))
         else:
-            # search on reversed, then map back
-            i1 = len(axis_vals) - int(np.searchsorted(axis_vals[::-1], value, side="right"))
-        i0 = i1 - 1
+            ascending = axis_vals[-1] > axis_vals[0]
+            if ascending:
+                i1 = int(np.searchsorted(axis_vals, value, side="left"))
+            else:
+                # search on reversed, then map back
+                i1 = n - int(np.searchsorted(axis_vals[::-1], value, side="right"))
+            i0 = i1 - 1
         # clamp to interior so we can form a 2×2
-        i0 = max(0, min(i0, len(axis_vals) - 2))
+        i0 = max(0, min(i0, n - 2))
         i1 = i0 + 1
         v0, v1 = axis_vals[i0], axis_vals[i1]
         t = 0.0 if v1 == v0 else (value - v0) / (v1 - v0)
@@ -255,22 +386,73 @@ def site_xy_fractional(ds: xr.Dataset, lat: float, lon: float) -> tuple[float, f
     return ix_f, iy_f
 
 
-def bilinear_neighbors(ix_f: float, iy_f: float) -> list[tuple[int, int, float]]:
+def bilinear_neighbors(ix_f: float, iy_f: float) -> Neighbors:
     """
     Return 2×2 neighbor indices with bilinear weights at fractional (ix_f, iy_f).
 
-    Output format: [(i0,j0,w00), (i1,j0,w10), (i0,j1,w01), (i1,j1,w11)],
-    where weights sum to 1.0 (before any validity filtering).
+    Output format: (idx_i, idx_j, w), three length-4 arrays ordered
+    (i0,j0), (i1,j0), (i0,j1), (i1,j1), where weights sum to 1.0 (before any
+    validity filtering).
     """
     i0 = int(np.floor(ix_f))
     j0 = int(np.floor(iy_f))
     tx = ix_f - i0
     ty = iy_f - j0
-    w00 = (1.0 - tx) * (1.0 - ty)
-    w10 = tx * (1.0 - ty)
-    w01 = (1.0 - tx) * ty
-    w11 = tx * ty
-    return [(i0, j0, w00), (i0 + 1, j0, w10), (i0, j0 + 1, w01), (i0 + 1, j0 + 1, w11)]
+    idx_i = np.array([i0, i0 + 1, i0, i0 + 1], dtype=np.intp)
+    idx_j = np.array([j0, j0, j0 + 1, j0 + 1], dtype=np.intp)
+    w = np.array(
+        [(1.0 - tx) * (1.0 - ty), tx * (1.0 - ty), (1.0 - tx) * ty, tx * ty],
+        dtype=np.float64,
+    )
+    return idx_i, idx_j, w
+
+
+# Site geometry is constant for a fixed grid + site, so cache it across scans.
+# Keyed on the projection attrs and axis layout (not the satellite name) so that
+# a satellite swap or a different product grid (ACMF 2 km vs ACHA 10 km) misses.
+_GEO_CACHE: dict[tuple, tuple[float, float, Neighbors]] = {}
+
+
+def _grid_key(ds: xr.Dataset) -> tuple:
+    """Hashable fingerprint of the dataset's fixed grid (projection + x/y axes)."""
+    g = _projection_attrs(ds)
+    proj = tuple(
+        str(g.get(k, ""))
+        for k in (
+            "longitude_of_projection_origin",
+            "perspective_point_height",
+            "sweep_angle_axis",
+            "semi_major_axis",
+            "semi_minor_axis",
+        )
+    )
+    axes = []
+    for name in ("x", "y"):
+        vals = ds[name].values
+        axes.append(
+            (vals.size, float(vals[0]), float(vals[-1]), str(ds[name].attrs.get("units", "")))
+        )
+    return proj + tuple(axes)
+
+
+def site_neighbors(ds: xr.Dataset, site: Site) -> tuple[float, float, Neighbors]:
+    """
+    Cached site_xy_fractional + bilinear_neighbors for `site` on the grid of `ds`.
+
+    Returns (ix_f, iy_f, neighbors). The first scan on a given grid pays for the
+    projection and bracket search; later scans are a dict lookup. The returned
+    neighbor arrays are shared and read-only.
+    """
+    key = (_grid_key(ds), site.lat, site.lon)
+    hit = _GEO_CACHE.get(key)
+    if hit is None:
+        ix_f, iy_f = site_xy_fractional(ds, site.lat, site.lon)
+        neighbors = bilinear_neighbors(ix_f, iy_f)
+        for arr in neighbors:
+            arr.setflags(write=False)
+        hit = (ix_f, iy_f, neighbors)
+        _GEO_CACHE[key] = hit
+    return hit
 
 
 # ---------------------------------------------------------------------
@@ -278,42 +460,101 @@ def bilinear_neighbors(ix_f: float, iy_f: float) -> list[tuple[int, int, float]]
 # ---------------------------------------------------------------------
 
 
-def _in_bounds(shape: tuple[int, int], i: int, j: int) -> bool:
-    H, W = shape
-    return 0 <= j < H and 0 <= i < W
+# Kernels are scalar loops over the 4 neighbors: cheap enough in plain Python,
+# and native code (with the GIL released) when numba is available. fastmath is
+# left off because its no-NaN assumption would fold away the isfinite checks.
+
+
+@njit(cache=True, nogil=True)
+def _cf_from_mask_kernel(mask_bcm, idx_i, idx_j, w):
+    H, W = mask_bcm.shape[0], mask_bcm.shape[1]
+    num = 0.0
+    den = 0.0
+    for k in range(w.shape[0]):
+        i, j, wk = idx_i[k], idx_j[k], w[k]
+        if wk <= 0.0 or not (0 <= j < H and 0 <= i < W):
+            continue
+        m = mask_bcm[j, i]
+        if not np.isfinite(m):
+            continue
+        den += wk
+        if m != 0.0:
+            num += wk
+    if den == 0.0:
+        return np.nan
+    return num / den
+
+
+@njit(cache=True, nogil=True)
+def _cf_above_kernel(cth_m, mask_bcm, idx_i, idx_j, w, site_alt_m):
+    Hb, Wb = mask_bcm.shape[0], mask_bcm.shape[1]
+    Hh, Wh = cth_m.shape[0], cth_m.shape[1]
+    num = 0.0
+    den = 0.0
+    for k in range(w.shape[0]):
+        i, j, wk = idx_i[k], idx_j[k], w[k]
+        if wk <= 0.0:
+            continue
+        if not (0 <= j < Hb and 0 <= i < Wb and 0 <= j < Hh and 0 <= i < Wh):
+            continue
+        m = mask_bcm[j, i]
+        h = cth_m[j, i]
+        if not (np.isfinite(m) and np.isfinite(h)):
+            # skip this neighbor entirely so weights renormalize
+            continue
+        den += wk
+        if m != 0.0 and h > site_alt_m:
+            num += wk
+    if den == 0.0:
+        return np.nan
+    # clear or below-alt clouds naturally yield 0.0 here
+    return num / den
 
 
 def cloud_fraction_from_mask(
-    mask_bcm: np.ndarray, weighted_neighbors: list[tuple[int, int, float]]
+    mask_bcm: np.ndarray, weighted_neighbors: Neighbors
 ) -> float:
     """
     Weighted mean of cloud presence at the site (bilinear interpolation).
 
     - mask_bcm: float array; nonzero=cloudy, 0=clear, NaN=missing.
-    - weighted_neighbors: [(i,j,w), ...] where weights sum to 1 (pre-filter).
+    - weighted_neighbors: (idx_i, idx_j, w) where weights sum to 1 (pre-filter).
     - Missing/out-of-bounds neighbors are ignored and weights are renormalized.
     """
-    num = 0.0
-    den = 0.0
-    H, W = mask_bcm.shape[:2]
+    idx_i, idx_j, w = weighted_neighbors
+    mask = np.asarray(mask_bcm, dtype=np.float64)
+    return float(_cf_from_mask_kernel(mask, idx_i, idx_j, w))
 
-    for i, j, w in weighted_neighbors:
-        if w <= 0 or not _in_bounds((H, W), i, j):
-            continue
-        m = mask_bcm[j, i]
-        if np.isfinite(m):
-            num += (1.0 if m != 0 else 0.0) * w
-            den += w
 
-    if den == 0.0:
-        return float("nan")
-    return float(num / den)
+def cloud_fraction_batch(mask_stack: np.ndarray, weighted_neighbors: Neighbors) -> np.ndarray:
+    """
+    cloud_fraction_from_mask for a stack of masks on one grid, shape (T, H, W) → (T,).
+
+    The neighbors are shared by all T masks (fixed grid + site, see site_neighbors),
+    so the 2×2 patches are gathered with one fancy-index into a (T, 4) array and
+    reduced without a per-scan loop. Same rules: missing/out-of-bounds neighbors
+    are ignored and weights renormalized; no valid neighbor → NaN.
+    """
+    idx_i, idx_j, w = weighted_neighbors
+    stack = np.asarray(mask_stack, dtype=np.float64)
+    T, H, W = stack.shape
+    if H == 0 or W == 0:  # window entirely off-grid
+        return np.full(T, np.nan, dtype=np.float64)
+    inside = (w > 0.0) & (idx_j >= 0) & (idx_j < H) & (idx_i >= 0) & (idx_i < W)
+    patches = stack[:, np.clip(idx_j, 0, H - 1), np.clip(idx_i, 0, W - 1)]  # (T, 4)
+
+    valid = np.isfinite(patches) & inside
+    wv = np.where(valid, w, 0.0)
+    den = wv.sum(axis=1)
+    num = np.where(patches != 0.0, wv, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0.0, num / den, np.nan)
 
 
 def cloud_fraction_above_alt(
     cth_m: np.ndarray,
     mask_bcm: np.ndarray,
-    weighted_neighbors: list[tuple[int, int, float]],
+    weighted_neighbors: Neighbors,
     site_alt_m: float,
 ) -> float:
     """
@@ -324,31 +565,164 @@ def cloud_fraction_above_alt(
     - If no valid neighbors (off-swath/missing) → NaN
     - Missing values (either mask or height) are skipped; weights renormalize.
     """
-    num = 0.0
-    den = 0.0
-    Hb, Wb = mask_bcm.shape[:2]
-    Hh, Wh = cth_m.shape[:2]
+    idx_i, idx_j, w = weighted_neighbors
+    cth = np.asarray(cth_m, dtype=np.float64)
+    mask = np.asarray(mask_bcm, dtype=np.float64)
+    return float(_cf_above_kernel(cth, mask, idx_i, idx_j, w, float(site_alt_m)))
 
-    for i, j, w in weighted_neighbors:
-        if w <= 0:
-            continue
-        if not (_in_bounds((Hb, Wb), i, j) and _in_bounds((Hh, Wh), i, j)):
-            continue
 
-        m = mask_bcm[j, i]
-        h = cth_m[j, i]
-        if not (np.isfinite(m) and np.isfinite(h)):
-            # skip this neighbor entirely so weights renormalize
-            continue
+# ---------------------------------------------------------------------
+# Neighborhood memo (persisted decoded 2×2 values, for re-runs/backfills)
+# ---------------------------------------------------------------------
 
-        den += w
-        if (m != 0) and (h > site_alt_m):
-            num += w
+# 2×2 neighborhood as stored in the memo, ordered like bilinear_neighbors:
+# corner names and their (idx_i, idx_j) into the 2×2 patch get() returns.
+_MEMO_CORNERS = ("00", "10", "01", "11")
+_MEMO_IDX = (np.array([0, 1, 0, 1], dtype=np.intp), np.array([0, 0, 1, 1], dtype=np.intp))
 
-    if den == 0.0:
-        return float("nan")
-    # clear or below-alt clouds naturally yield 0.0 here
-    return float(num / den)
+# flush() merges the memo's part files into one once there are more than this.
+_MEMO_MAX_PARTS = 16
+
+
+def _memo_columns() -> list[str]:
+    return ["key"] + [f"v{c}" for c in _MEMO_CORNERS] + [f"w{c}" for c in _MEMO_CORNERS]
+
+
+def neighborhood_values(patch: np.ndarray, neighbors: Neighbors) -> np.ndarray:
+    """
+    Return the 4 values of `patch` at `neighbors` (NaN for out-of-bounds neighbors).
+
+    NaN and out-of-bounds neighbors are both skipped by the fraction kernels, so
+    (values, weights) is all that is needed to recompute a fraction later.
+    """
+    idx_i, idx_j, _ = neighbors
+    H, W = patch.shape
+    vals = np.full(4, np.nan, dtype=np.float64)
+    ok = (idx_j >= 0) & (idx_j < H) & (idx_i >= 0) & (idx_i < W)
+    vals[ok] = patch[idx_j[ok], idx_i[ok]]
+    return vals
+
+
+class NeighborhoodMemo:
+    """
+    Persistent memo of decoded site neighborhoods, keyed by (satellite, product, scan, site).
+
+    Each row holds the four decoded values of the site's 2×2 neighborhood
+    (v00..v11; NaN = missing/out of bounds) and their bilinear weights (w00..w11).
+    A hit lets re-runs skip the download, NetCDF open and decode.
+
+    Stored as a Parquet dataset directory: Parquet files cannot be appended to, so
+    each flush() writes one new part file (pyarrow, dictionary-encoded keys), and
+    merges the parts into one once there are more than _MEMO_MAX_PARTS.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._rows: dict[str, tuple[np.ndarray, np.ndarray]] | None = None
+        self._pending: list[tuple[str, np.ndarray, np.ndarray]] = []
+
+    def _load(self) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        if self._rows is None:
+            self._rows = {}
+            if self.root.is_dir() and any(self.root.glob("*.parquet")):
+                import pyarrow.parquet as pq
+
+                tbl = pq.read_table(self.root, columns=_memo_columns())
+                keys = tbl.column("key").to_pylist()
+                vals = np.column_stack(
+                    [tbl.column(f"v{c}").to_numpy() for c in _MEMO_CORNERS]
+                ).astype(np.float64)
+                ws = np.column_stack(
+                    [tbl.column(f"w{c}").to_numpy() for c in _MEMO_CORNERS]
+                ).astype(np.float64)
+                # Later parts win if a key was written twice.
+                self._rows = {k: (vals[n], ws[n]) for n, k in enumerate(keys)}
+        return self._rows
+
+    def get(self, key: str) -> tuple[np.ndarray, Neighbors] | None:
+        """
+        Return (patch, neighbors) for `key`, or None on a miss.
+
+        patch is 2×2 and neighbors index it directly, so the result can be passed
+        straight to cloud_fraction_from_mask / cloud_fraction_above_alt.
+        """
+        hit = self._load().get(key)
+        if hit is None:
+            return None
+        vals, w = hit
+        idx_i, idx_j = _MEMO_IDX
+        return vals.reshape(2, 2), (idx_i, idx_j, w)
+
+    def put(self, key: str, patch: np.ndarray, neighbors: Neighbors) -> None:
+        """
+        Remember the neighborhood of `patch` (read with `neighbors`) under `key`.
+
+        Rows are buffered in memory until flush().
+        """
+        vals = neighborhood_values(patch, neighbors)
+        w = np.asarray(neighbors[2], dtype=np.float64).copy()
+        self._load()[key] = (vals, w)
+        self._pending.append((key, vals, w))
+
+    def flush(self) -> None:
+        """Write buffered rows as a new part file (atomic rename), compacting if needed."""
+        if not self._pending:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        vals = np.vstack([row[1] for row in self._pending])
+        ws = np.vstack([row[2] for row in self._pending])
+        cols: dict[str, Any] = {
+            "key": pa.array([row[0] for row in self._pending]).dictionary_encode(),
+        }
+        for n, c in enumerate(_MEMO_CORNERS):
+            cols[f"v{c}"] = vals[:, n]
+        for n, c in enumerate(_MEMO_CORNERS):
+            cols[f"w{c}"] = ws[:, n]
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+        tmp = self.root / f".{name}.tmp"
+        pq.write_table(pa.table(cols), tmp, compression="snappy")
+        tmp.replace(self.root / name)
+        self._pending.clear()
+        self._compact()
+
+    def _compact(self) -> None:
+        """
+        Merge the part files into one (the newest part's name) once there are
+        more than _MEMO_MAX_PARTS. Only the parts listed here are merged and
+        removed, so parts written concurrently by another process survive.
+        """
+        parts = sorted(self.root.glob("part-*.parquet"))
+        if len(parts) <= _MEMO_MAX_PARTS:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tbl = pa.concat_tables([pq.read_table(p, columns=_memo_columns()) for p in parts])
+        # One row per key; the later part wins, as in _load().
+        last = {k: n for n, k in enumerate(tbl.column("key").to_pylist())}
+        tbl = tbl.take(sorted(last.values()))
+
+        tmp = self.root / f".{parts[-1].name}.tmp"
+        pq.write_table(tbl, tmp, compression="snappy")
+        tmp.replace(parts[-1])
+        for old in parts[:-1]:
+            old.unlink(missing_ok=True)
+
+
+_MEMOS: dict[Path, NeighborhoodMemo] = {}
+
+
+def memo_neighborhood_cache(root: str | Path) -> NeighborhoodMemo:
+    """Return the (process-wide) NeighborhoodMemo stored at `root`."""
+    key = Path(root)
+    memo = _MEMOS.get(key)
+    if memo is None:
+        memo = _MEMOS[key] = NeighborhoodMemo(key)
+    return memo
 
 
 # ---------------------------------------------------------------------
@@ -359,4 +733,11 @@ def cloud_fraction_above_alt(
 def write_csv(df: pd.DataFrame, path: str | Path) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(p, index=False)
\ No newline at end of file
+    df.to_csv(p, index=False)
+
+
+def write_parquet(df: pd.DataFrame, path: str | Path) -> None:
+    """Write `df` as Parquet (pyarrow, snappy); keeps dtypes incl. tz-aware timestamps."""
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(p, engine="pyarrow", compression="snappy", index=False)
@@ -46,7 +46,8 @@ query = EFDTemperatureQuery(
     freq="15min",
     verbose=True
 )
-df = query.to_csv(monthly_path)
+df = query.fetch()
 
 # --- Step 3: Save to the monthly archive ---
+handler.write_monthly(df, monthly_path)
 print(f"✅ Saved monthly data to {monthly_path}")
\ No newline at end of file
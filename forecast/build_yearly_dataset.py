@@ -1,9 +1,11 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pytz
 import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
 from pathlib import Path
-from helper import DataFileHandler
-from run_forecast import build_forecast_csv
+from helper import DataFileHandler, TWILIGHT_FLAG_COLUMNS, to_epoch_ns
 from prophetModel import ProphetTwilightValidator
 
 def main():
@@ -11,16 +13,15 @@ def main():
 
     csv_path = '/sdf/home/e/esteves/sitcom-analysis/prophetTempForecast/temp_window_365d_2025-08-02.csv'
     print(f"Loading full-year CSV from {csv_path}...")
-    df = pd.read_csv(csv_path, parse_dates=['timestamp'])
-    df.set_index('timestamp', inplace=True)
+    # Parsed once with pyarrow (UTC-aware), then served from a Parquet copy next
+    # to the CSV; a single tz_convert gives local Chilean time.
     tz_chile = pytz.timezone("America/Santiago")
-    df.index = df.index.tz_localize('UTC')
-    df.index = df.index.tz_convert(tz_chile)
+    df = handler.read_source_df(csv_path).tz_convert(tz_chile)
 
-    for col in ["is_evening_twilight", "is_morning_twilight", "is_sunset", "is_sunrise"]:
+    # Missing flags (nulls) → False
+    for col in TWILIGHT_FLAG_COLUMNS:
         if col in df.columns:
-            df[col] = df[col].map(object_to_bool)
-            df[col] = df[col].astype(bool)
+            df[col] = to_bool_series(df[col])
             
     min_ts = df.index.min()
     max_ts = df.index.max()
@@ -29,51 +30,83 @@ def main():
     start_month = (min_ts + pd.offsets.MonthBegin(1)).replace(hour=0, minute=0)
     end_month = (max_ts - pd.offsets.MonthBegin(2)).replace(hour=0, minute=0)
     print(f"Processing months from {start_month.strftime('%Y-%m')} to {end_month.strftime('%Y-%m')}...")
-    current_month = start_month
-    while current_month <= end_month:
-        month_int = current_month.month
-        month_next_int = (current_month.month + 1 ) if current_month.month < 12 else 1
-        # Define start and end of the month in Chilean local time
-        month_start_local = tz_chile.localize(pd.Timestamp(current_month.year, month_int, 1))
-        month_end_local = tz_chile.localize(pd.Timestamp(current_month.year, month_next_int, 1))
 
+    # Month boundaries in local Chilean time, built once; the last entry only
+    # closes the final month.
+    month_bounds = pd.date_range(
+        start=start_month.tz_localize(None).normalize(),
+        end=end_month.tz_localize(None).normalize() + pd.offsets.MonthBegin(1),
+        freq='MS',
+        tz=tz_chile,
+    )
+    if len(month_bounds) < 2:
+        print("No complete month to process.")
+        return
+
+    # One contiguous 15-min grid covering every padded month window; months are
+    # then cut from it by position instead of slicing + reindexing each time.
+    grid_start = month_bounds[0] - pd.Timedelta(days=7)
+    full_index = pd.date_range(start=grid_start, end=month_bounds[-1], freq='15min', tz=tz_chile)
+    df_full = df.reindex(full_index)
+    grid_ns = to_epoch_ns(full_index)
+    data_ns = to_epoch_ns(df.index)
+
+    jobs = []
+    for month_start_local, month_end_local in zip(month_bounds[:-1], month_bounds[1:]):
         # Define the data slice window
         slice_start_local = month_start_local - pd.Timedelta(days=7)
         slice_end_local = month_end_local
 
         print(f"Processing month {month_start_local.strftime('%Y-%m')}...")
-        df_slice = df.loc[slice_start_local:slice_end_local]
+        # Rows of the source data inside the window (bounds inclusive, like .loc)
+        lo = np.searchsorted(data_ns, slice_start_local.value, side='left')
+        hi = np.searchsorted(data_ns, slice_end_local.value, side='right')
 
-        if df_slice.empty:
+        if hi <= lo:
             print(f"  Skipping month {month_start_local.strftime('%Y-%m')} due to empty data slice.")
-            current_month += pd.DateOffset(months=1)
             continue
         
-        full_index = pd.date_range(start=slice_start_local, end=slice_end_local, freq='15min', tz=tz_chile)
-        df_slice = df_slice.reindex(full_index)
-
-        out_path = handler.get_monthly_archive_path(month_start_local)
-        os.makedirs(out_path.parent, exist_ok=True)
-        print(f"  Writing monthly dataset to {out_path}...")
-        handler.to_csv(df_slice, out_path)
-
-        current_month += pd.DateOffset(months=1)
-
-def object_to_bool(val):
-    if pd.isna(val):
-        return False
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, (int, float)):
-        return bool(val)
-    # Handle string values ('True', 'true', 'False', 'false', '1', '0', etc)
-    if isinstance(val, str):
-        v = val.strip().lower()
-        if v in {'true', '1', 't', 'yes'}:
-            return True
-        if v in {'false', '0', 'f', 'no', ''}:
-            return False
-    return False  # Default fallback
+        i0 = np.searchsorted(grid_ns, slice_start_local.value, side='left')
+        i1 = np.searchsorted(grid_ns, slice_end_local.value, side='right')
+        jobs.append((df_full.iloc[i0:i1], month_start_local))
+
+    # Months are independent: write them in parallel worker processes
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1) or 1) as ex:
+        futures = [ex.submit(write_month, handler, df_slice, m) for df_slice, m in jobs]
+        for fut in futures:
+            print(f"  Wrote monthly dataset to {fut.result()}")
+
+
+def write_month(handler: DataFileHandler, df_slice: pd.DataFrame, month_start_local) -> Path:
+    """Write one padded month window to its monthly archive path; returns the path."""
+    out_path = handler.get_monthly_archive_path(month_start_local)
+    os.makedirs(out_path.parent, exist_ok=True)
+    handler.write_monthly(df_slice, out_path)
+    return out_path
+
+
+_BOOL_STRINGS = {
+    'true': True, '1': True, 't': True, 'yes': True,
+    'false': False, '0': False, 'f': False, 'no': False, '': False,
+}
+
+
+def to_bool_series(s: pd.Series) -> pd.Series:
+    """
+    Vectorized truthiness of a flag column read from CSV.
+
+    Bool and numeric columns: NaN → False, nonzero → True. Other columns are
+    matched case-insensitively against 'true'/'1'/'t'/'yes' and
+    'false'/'0'/'f'/'no'/''; remaining numeric values are True if nonzero,
+    anything else (incl. NaN) is False.
+    """
+    if is_bool_dtype(s):
+        return s.fillna(False).astype(bool)
+    if is_numeric_dtype(s):
+        return s.fillna(0) != 0
+    out = s.astype("string").str.strip().str.lower().map(_BOOL_STRINGS)
+    num = pd.to_numeric(s.where(out.isna()), errors="coerce")
+    return out.fillna(num.fillna(0) != 0).astype(bool)
 
 if __name__ == "__main__":
     main()
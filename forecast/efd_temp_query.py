@@ -1,5 +1,6 @@
 # Standard Library Imports
 from datetime import timedelta, datetime
+from functools import lru_cache
 import numpy as np
 import pytz
 
@@ -8,7 +9,8 @@ from astropy.time import Time
 import pandas as pd
 
 # Local Imports
-from helper import TwilightTimes
+from helper import (TWILIGHT_FLAG_COLUMNS, TwilightTimes, ensure_utc_index, to_epoch_ns,
+                    write_timestamped_csv, write_timestamped_parquet)
 
 class EFDTemperatureQuery:
     """
@@ -19,21 +21,25 @@ class EFDTemperatureQuery:
         end_date (datetime): End datetime for the query window (tz-aware).
         freq (str): Resampling frequency for the output (default: '15min').
         verbose (bool): If True, print query info and stats.
-        columns (list): Columns to fetch from EFD (default: temperature vars).
+        columns (list): Columns to fetch from EFD (default: temperatureItem0, salIndex).
+        sal_index (int): ESS sensor (salIndex) whose temperature is kept (default: 301).
     Methods:
         _query_efd(): Query EFD and return temperature DataFrame without event flags.
         set_twilight_flags(df): Add twilight event flags to DataFrame.
-        fetch(): Fetch and return temperature DataFrame with twilight flags.
+        fetch(cached=None): Fetch and return temperature DataFrame with twilight flags,
+            optionally merged over previously cached rows.
         to_csv(filename, df=None): Write DataFrame to CSV file.
+        to_parquet(filename, df=None): Write DataFrame to Parquet (zstd) file.
     """
 
     def __init__(self, start_date: datetime, end_date: datetime, freq: str = "15min",
-                 buffer: str = None, verbose: bool = True, columns=None):
+                 buffer: str = None, verbose: bool = True, columns=None, sal_index: int = 301):
         """
         Initialize with start_date and end_date (tz-aware), and resampling period.
         """
         if columns is None:
-            columns = ["temperatureItem0", "salIndex", "location"]
+            # only what _query_efd consumes: the reading and the sensor id to filter on
+            columns = ["temperatureItem0", "salIndex"]
         self.start_date = start_date
         self.end_date = end_date
         self.freq = freq
@@ -43,13 +49,14 @@ class EFDTemperatureQuery:
         self.buffer = pd.to_timedelta(buffer)
         self.verbose = verbose
         self.columns = columns
+        self.sal_index = sal_index
 
     def _query_efd(self) -> pd.DataFrame:
         """
         Retrieve and aggregate temperature data for the date range.
         """
-        from lsst.summit.utils.efdUtils import getEfdData, makeEfdClient
-        client = makeEfdClient()
+        from lsst.summit.utils.efdUtils import getEfdData
+        client = efd_client()
         df_outside = getEfdData(
             client=client,
             topic="lsst.sal.ESS.temperature",
@@ -58,22 +65,15 @@ class EFDTemperatureQuery:
             end=Time(self.end_date + self.buffer),
         )
         
-        mask = df_outside.salIndex == 301
+        mask = df_outside.salIndex == self.sal_index
         df_outside = df_outside[mask]
         df_outside = df_outside.drop(columns=["salIndex"])
         df_outside = df_outside.rename(columns={"temperatureItem0": "temperature"})
 
-        df_outside = df_outside.rolling(self.freq).agg(
-            {"temperature": ["min", "mean", "max"]}
-        )
-        df_outside.columns = df_outside.columns.droplevel(0)
-        df_outside = df_outside.resample(self.freq).mean()
+        # Per-interval extrema and mean in one resample pass
+        df_outside = df_outside.resample(self.freq)["temperature"].agg(["min", "mean", "max"])
         
-        # check timezone awareness
-        if df_outside.index.tz is None:
-            df_outside.index = df_outside.index.tz_localize('UTC')
-        if df_outside.index.tz != 'UTC':
-            df_outside.index = df_outside.index.tz_convert('UTC')
+        ensure_utc_index(df_outside)
 
         # Align to regular time grid using asfreq (skip reindex)
         df_outside = df_outside.asfreq(self.freq)
@@ -95,13 +95,13 @@ class EFDTemperatureQuery:
         within the specified window around each event time, across the
         entire date range.
         """
-        # check if df.index is tz aware, if not, localize to UTC
-        if df.index.tz is None:
-            df.index = df.index.tz_localize('UTC')
+        ensure_utc_index(df)
 
         # Collect twilight events for each local day in the window
         tz_santiago = pytz.timezone("America/Santiago")
-        start_local = self.start_date.astimezone(tz_santiago).date()
+        # (from the earliest row, which precedes start_date for cache-merged frames)
+        start = min(pd.Timestamp(self.start_date), df.index.min()) if len(df) else self.start_date
+        start_local = start.astimezone(tz_santiago).date()
         end_local = self.end_date.astimezone(tz_santiago).date()
 
         # Initialize lists for each event type
@@ -112,11 +112,9 @@ class EFDTemperatureQuery:
             'is_morning_twilight': [],
         }
 
-        # Gather UTC event times across all days in the range
-        # for single_day in pd.date_range(start=start_local, end=end_local, freq='D', tz=tz_santiago):
-        for single_day in pd.date_range(start=start_local, end=end_local, freq='D'):
-            day_str = single_day.strftime('%Y-%m-%d')
-            tw = TwilightTimes.from_day(day_str)
+        # Gather UTC event times across all days in the range (one batched solve)
+        days = pd.date_range(start=start_local, end=end_local, freq='D')
+        for tw in TwilightTimes.batch(list(days.strftime('%Y-%m-%d'))):
             event_times['is_sunset'].append(tw.sunset_utc)
             event_times['is_sunrise'].append(tw.sunrise_utc)
             event_times['is_evening_twilight'].append(tw.evening_twilight_utc)
@@ -126,45 +124,107 @@ class EFDTemperatureQuery:
         period_td = pd.to_timedelta(self.freq)
         window_minutes = int(period_td.total_seconds() // 60 * 2)
 
-        # Flag events for each column
-        for col, times in event_times.items():
-            df[col] = flag_events(df, times, window_minutes)
+        # Flag events for all columns in one (N, 4) block, assigned at once
+        flags = np.zeros((len(df), len(event_times)), dtype=bool)
+        for j, times in enumerate(event_times.values()):
+            flags[event_positions(df.index, times, window_minutes), j] = True
+        df[list(event_times)] = flags
         return df
 
-    def fetch(self) -> pd.DataFrame:
+    def fetch(self, cached: pd.DataFrame = None) -> pd.DataFrame:
         """
         Fetch and return the temperature DataFrame with twilight flags.
+
+        If `cached` is given (earlier rows of the same day), the fresh rows are
+        merged over it (fresh values win) and the twilight flags are computed
+        once on the merged frame. Flagging the fresh slice on its own could
+        snap an event just before the slice start onto its first row, and the
+        cache already has that event flagged.
         """
         df = self._query_efd()
         print(f"Fetched {len(df)} rows from EFD."
               f" Temperature data from {df.index.min().isoformat()} to {df.index.max().isoformat()}.")
+        if cached is not None and not cached.empty:
+            cached = cached.drop(columns=TWILIGHT_FLAG_COLUMNS, errors="ignore")
+            df = df.combine_first(cached)
         df = self.set_twilight_flags(df)
         return df
 
     def to_csv(self, filename, df=None):
         if df is None:
             df = self.fetch()
-        df_reset = df.reset_index().rename(columns={"index": "timestamp"})
-        
-        # Ensure ISO formatting with UTC offset
-        df_reset["timestamp"] = df_reset["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        df_reset.to_csv(filename, index=False)
+        # ISO formatting with UTC offset; Arrow CSV writer
+        write_timestamped_csv(df, filename)
+        print(f"Data written to file: {filename}")
+
+    def to_parquet(self, filename, df=None, compression="zstd"):
+        if df is None:
+            df = self.fetch()
+        # UTC 'timestamp' column, same layout as the monthly archives
+        write_timestamped_parquet(df, filename, compression=compression)
         print(f"Data written to file: {filename}")
 
+@lru_cache(maxsize=1)
+def efd_client():
+    """
+    EFD client shared by all queries in this process (created on first use).
+
+    run_forecast_loop queries every tick in the same process, so the client's
+    auth/connection setup is paid once instead of once per query.
+    """
+    from lsst.summit.utils.efdUtils import makeEfdClient
+    return makeEfdClient()
+
+def event_positions(index: pd.DatetimeIndex, event_times: list, window_minutes: int) -> np.ndarray:
+    """
+    Return the positions in `index` of the timestamp closest to each event,
+    keeping only events within window_minutes of it (ties go to the earlier
+    timestamp). `index` must be sorted.
+    """
+    if len(index) == 0 or len(event_times) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    idx_ns = to_epoch_ns(index)
+    ev_ns = to_epoch_ns(event_times)
+
+    step = _fixed_step_ns(index)
+    if step:
+        # Regular grid: snap arithmetically (half-step ties round down)
+        pos = (ev_ns - idx_ns[0] + (step - 1) // 2) // step
+        nearest = np.clip(pos, 0, len(idx_ns) - 1)
+    else:
+        # Nearest grid point per event: the insertion point or the one before it
+        pos = np.searchsorted(idx_ns, ev_ns)
+        right = np.clip(pos, 0, len(idx_ns) - 1)
+        left = np.clip(pos - 1, 0, len(idx_ns) - 1)
+        d_right = np.abs(idx_ns[right] - ev_ns)
+        d_left = np.abs(idx_ns[left] - ev_ns)
+        nearest = np.where(d_left <= d_right, left, right)
+    d_nearest = np.abs(idx_ns[nearest] - ev_ns)
+
+    within_window = d_nearest <= pd.Timedelta(minutes=window_minutes).value
+    return nearest[within_window]
+
+
+def _fixed_step_ns(index: pd.DatetimeIndex) -> int:
+    """Step of a fixed-frequency index in ns, or 0 if the index has no fixed step."""
+    if len(index) < 2 or index.freq is None:
+        return 0
+    try:
+        return int(pd.Timedelta(index.freq).value)
+    except ValueError:  # non-fixed offsets (e.g. month starts)
+        return 0
+
+
 def flag_events(df: pd.DataFrame, event_times: list, window_minutes: int) -> np.ndarray:
     """
     Create a boolean array indicating if each timestamp in df.index
     falls within window_minutes of any event time in event_times.
+
+    Only the timestamp closest to each event is flagged (see event_positions).
     """
-    flags = pd.Series(False, index=df.index)
-    for t_event in event_times:
-        # Find the closest timestamp in df within tolerance
-        diffs = np.abs(df.index - t_event)
-        within_window = diffs <= pd.Timedelta(minutes=window_minutes)
-        if within_window.any():
-            closest_idx = diffs[within_window].argmin()
-            closest_idx = df.index[within_window][closest_idx]
-            flags[closest_idx] = True     
+    flags = np.zeros(len(df), dtype=bool)
+    flags[event_positions(df.index, event_times, window_minutes)] = True
     return flags
 
 if __name__ == "__main__":
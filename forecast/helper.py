@@ -5,9 +5,18 @@ from astroplan import Observer
 # Standard Library Imports
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 from pathlib import Path
+import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+TWILIGHT_FLAG_COLUMNS = ["is_evening_twilight", "is_morning_twilight", "is_sunset", "is_sunrise"]
 
 
 def floor_dt(dt, freq="15min"):
@@ -47,14 +56,14 @@ class DataFileHandler:
         else:
             day = day.astimezone(tz_chile)
         day_str = day.strftime('%Y%m%d')
-        return self.cache_dir / f"efd_temp_{day_str}.csv"
+        return self.cache_dir / f"efd_temp_{day_str}.parquet"
         
     def get_monthly_archive_path(self, dt: datetime) -> Path:
         """Returns Path to the monthly archive for the given datetime."""
         dt = ensure_utc_timezone(dt).astimezone(pytz.timezone("America/Santiago"))
         ym = dt.strftime("%Y-%m")
         month_dir = self.archive_dir / ym
-        return month_dir / f"forecast_{ym}.csv"
+        return month_dir / f"forecast_{ym}.parquet"
 
     def read_cache_df(self, day: datetime) -> pd.DataFrame:
         cache_path = self.get_daily_cache_path(day)
@@ -62,13 +71,10 @@ class DataFileHandler:
             print(f"❌ Cache file missing: {cache_path}")
             return pd.DataFrame()
 
-        df = pd.read_csv(cache_path, index_col=0, parse_dates=True)
+        df = read_timestamped_parquet(cache_path)
         # print the number of nan values found in the dataframe
         print(f"Read cache file: {cache_path} with {df.isna().sum().sum()} NaN values")
-        if df.index.tz is None:
-            df.index = df.index.tz_localize("UTC")
-        else:
-            df.index = df.index.tz_convert("UTC")
+        ensure_utc_index(df)
         df.index.freq = self.freq
         return df
 
@@ -79,13 +85,13 @@ class DataFileHandler:
         if df_daily.empty:
             print(f"[WARN] No daily cache data to update monthly for {dt.strftime('%Y-%m-%d')}")
             return
-        # Update monthly with daily
-        df_monthly.update(df_daily)
+        # Update monthly with daily: non-NaN cache values win, in one aligned pass
+        daily = df_daily.reindex(index=df_monthly.index, columns=df_monthly.columns)
+        df_monthly = daily.where(daily.notna(), df_monthly)
         
         # Write back
         month_path = self.get_monthly_archive_path(dt)
-        month_path.parent.mkdir(parents=True, exist_ok=True)
-        self.to_csv(df_monthly, month_path)
+        self.write_monthly(df_monthly, month_path)
 
     def read_monthly_df(self, dt: datetime) -> pd.DataFrame:
         dt = ensure_utc_timezone(dt).astimezone(pytz.timezone("America/Santiago"))
@@ -96,15 +102,42 @@ class DataFileHandler:
                 "Please build it first using build_monthly_dataset.py"
             )
             raise FileNotFoundError(f"Missing: {path}")
-        df = pd.read_csv(path, index_col=0, parse_dates=True)
-        if df.index.tz is None:
-            df.index = df.index.tz_localize("UTC")
-        else:
-            df.index = df.index.tz_convert("UTC")
-        
+        df = read_timestamped_parquet(path)
         df.index.freq = self.freq
         return df
 
+    def write_monthly(self, df: pd.DataFrame, out_path: Path):
+        """Write a monthly archive DataFrame as Parquet (UTC 'timestamp' column, zstd)."""
+        write_timestamped_parquet(df, out_path)
+
+    def read_source_df(self, csv_path) -> pd.DataFrame:
+        """
+        Read an EFD temperature CSV (as written by EFDTemperatureQuery.to_csv).
+
+        The parsed frame is memoized next to the CSV as `<csv_path>.parquet`
+        (zstd); it is rebuilt whenever the CSV is newer. Returns a frame indexed
+        by UTC 'timestamp' with the twilight flags as bool.
+        """
+        csv_path = Path(csv_path)
+        cache_path = csv_path.with_name(csv_path.name + ".parquet")
+        if not cache_path.exists() or cache_path.stat().st_mtime < csv_path.stat().st_mtime:
+            table = pv.read_csv(
+                csv_path,
+                convert_options=pv.ConvertOptions(
+                    column_types={
+                        # parsed below: older archives hold naive timestamps
+                        "timestamp": pa.string(),
+                        **{col: pa.bool_() for col in TWILIGHT_FLAG_COLUMNS},
+                    },
+                ),
+            )
+            df = table.to_pandas()
+            # naive values are UTC (as the original loader assumed); aware ones convert
+            df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="ISO8601")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            atomic_write(cache_path, lambda tmp: pq.write_table(table, tmp, compression="zstd"))
+        return pd.read_parquet(cache_path, engine="pyarrow").set_index("timestamp")
+
     def build_rolling_window_df(self, now: datetime) -> pd.DataFrame:
         """Return a DataFrame for the last `window_days` up to `now`, filling from cache & monthly archive."""
         # make sure now is in UTC
@@ -120,13 +153,8 @@ class DataFileHandler:
         # Update monthly archive with latest cache
         self.update_monthly_archive(now_local)
 
-        # Then the relevant month 
-        monthly_df = self.read_monthly_df(end).reindex(idx)
-
-        # Build result, prefer cache over archive
-        out = pd.DataFrame(index=idx, columns=monthly_df.columns)
-        out.update(monthly_df)
-        return out
+        # Then the relevant month (already holds the cache), aligned to the window
+        return self.read_monthly_df(end).reindex(idx)
 
     def write_latest(self, df: pd.DataFrame):
         df.to_csv(self.latest_file, index=True)
@@ -136,9 +164,65 @@ class DataFileHandler:
     
     def to_csv(self, df: pd.DataFrame, out_path: Path):
         """Write the forecast DataFrame to CSV with proper formatting."""
-        df_reset = df.reset_index().rename(columns={"index": "timestamp"})
-        df_reset["timestamp"] = df_reset["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        df_reset.to_csv(out_path, index=False)
+        write_timestamped_csv(df, out_path)
+
+
+def to_epoch_ns(times) -> np.ndarray:
+    """
+    Integer nanoseconds since the epoch (UTC) of datetime-like values.
+    DatetimeIndex.asi8 is in the index's own resolution (us by default in
+    recent pandas), so it can't be compared with Timestamp.value (always ns).
+    """
+    return pd.DatetimeIndex(times).values.astype("datetime64[ns]").view("i8")
+
+def write_timestamped_csv(df: pd.DataFrame, out_path):
+    """
+    Write a time-indexed DataFrame to CSV with a leading 'timestamp' column
+    formatted as "%Y-%m-%dT%H:%M:%SZ".
+
+    Uses Arrow's (multithreaded, C) CSV writer; the timestamps are formatted in
+    one vectorized pass after conversion to UTC.
+    """
+    df_reset = df.rename_axis("timestamp").reset_index()
+    df_reset["timestamp"] = pd.to_datetime(df_reset["timestamp"], utc=True)
+    table = pa.Table.from_pandas(df_reset, preserve_index=False)
+    ts = pc.strftime(table.column("timestamp"), format="%Y-%m-%dT%H:%M:%SZ")
+    table = table.set_column(0, "timestamp", ts)
+    atomic_write(out_path, lambda tmp: pv.write_csv(table, tmp))
+
+def write_timestamped_parquet(df: pd.DataFrame, out_path, compression: str = "zstd"):
+    """
+    Write a time-indexed DataFrame as Parquet with the index stored as a UTC
+    'timestamp' column. Creates the parent directory if needed.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    df_reset = df.reset_index(names="timestamp")
+    df_reset["timestamp"] = pd.to_datetime(df_reset["timestamp"], utc=True)
+    table = pa.Table.from_pandas(df_reset, preserve_index=False)
+    atomic_write(out_path, lambda tmp: pq.write_table(table, tmp, compression=compression))
+
+def atomic_write(out_path, write):
+    """
+    Call `write(tmp_path)` on a temporary file next to `out_path`, then move it
+    over `out_path` with os.replace, so readers (and a crash mid-write) never
+    see a truncated file.
+    """
+    out_path = Path(out_path)
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def read_timestamped_parquet(path) -> pd.DataFrame:
+    """Read a file written by write_timestamped_parquet, indexed by UTC timestamp."""
+    df = pd.read_parquet(path, engine="pyarrow").set_index("timestamp")
+    df.index.name = None
+    ensure_utc_index(df)
+    return df
 
 def get_chile_midnight_window(now: datetime, window_days: int):
     """Get start and end UTC timestamps for a window ending at Chile local midnight."""
@@ -154,23 +238,46 @@ def get_chile_midnight_window(now: datetime, window_days: int):
     # print(end_utc.strftime("UTC end time: %Y-%m-%d %H:%M:%S %Z"))
     return start_utc, end_utc
 
+def ensure_utc_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make df's DatetimeIndex UTC in place (naive → localized as UTC, other
+    zones → converted) and return df. No-op if the index is already UTC.
+    """
+    tz = df.index.tz
+    if tz is None:
+        df.index = df.index.tz_localize("UTC")
+    elif str(tz) != "UTC":
+        df.index = df.index.tz_convert("UTC")
+    return df
+
+
 def ensure_utc_timezone(dt: datetime) -> datetime:
     """
     Ensure that a datetime object is timezone-aware in UTC.
 
-    - If dt is naive, assumes it is UTC and attaches tzinfo.
+    - If dt is naive, assumes it is in the system local timezone, with the
+      UTC offset in effect at dt (so DST changes are honoured, also in a
+      long-running process).
     - If dt is tz-aware, converts to UTC.
     - Returns a new datetime object (never mutates in-place).
     """
-    if dt.tzinfo is None:
-        # find the correct timezeon
-        tznow = datetime.now().astimezone().tzinfo
-        return dt.replace(tzinfo=tznow).astimezone(pytz.UTC)
-    if dt.tzinfo != pytz.UTC and dt.tzinfo != timezone.utc:
+    tz = dt.tzinfo
+    if tz is None:
+        if isinstance(dt, pd.Timestamp):
+            dt = dt.to_pydatetime()
+        # naive datetime.astimezone() resolves the local offset for dt itself
         return dt.astimezone(timezone.utc)
-    return dt
+    if tz is pytz.UTC or tz is timezone.utc:
+        return dt
+    return dt.astimezone(timezone.utc)
     
 
+@lru_cache(maxsize=None)
+def _rubin_observer() -> Observer:
+    """Astroplan observer for the site; built once, on first use (site lookup is not free)."""
+    return Observer.at_site("Rubin AuxTel")
+
+
 @dataclass
 class TwilightTimes:
     """
@@ -291,10 +398,14 @@ class TwilightTimes:
         print("Morning Nautical Twilight (UTC):", self.morning_twilight_utc)
 
     @staticmethod
+    @lru_cache(maxsize=512)
     def from_day(date: str):
         """
         Factory method to create a TwilightTimes instance for a specific date.
 
+        Results are memoized per date (days repeat across overlapping query
+        windows); treat the returned instance as read-only.
+
         Args:
             date (str): The date in ISO format for which to compute twilight times.
 
@@ -302,8 +413,77 @@ class TwilightTimes:
             TwilightTimes: An instance initialized for the given date at Rubin AuxTel.
         """
         local_tz = pytz.timezone("America/Santiago")
-        observer = Observer.at_site("Rubin AuxTel")
-        return TwilightTimes(date=date, local_timezone=local_tz, observer=observer)
+        return TwilightTimes(date=date, local_timezone=local_tz, observer=_rubin_observer())
+
+    @staticmethod
+    def for_range(start, end) -> list:
+        """
+        Compute TwilightTimes for every day from `start` to `end` (inclusive).
+
+        Args:
+            start, end: Dates (ISO strings or date-like), local Chilean days.
+
+        Returns:
+            list[TwilightTimes]: One instance per day, in date order (see batch).
+        """
+        dates = list(pd.date_range(start=start, end=end, freq="D").strftime("%Y-%m-%d"))
+        return TwilightTimes.batch(dates)
+
+    @classmethod
+    def batch(cls, dates: list) -> list:
+        """
+        Compute TwilightTimes for many dates at Rubin AuxTel in one pass.
+
+        Same results as calling from_day per date, but each of the four events is
+        solved once for all dates by passing an array Time to astroplan.
+
+        Args:
+            dates (list[str]): Dates in ISO format.
+
+        Returns:
+            list[TwilightTimes]: One instance per date, in the given order.
+        """
+        local_tz = pytz.timezone("America/Santiago")
+        observer = _rubin_observer()
+        dates = list(dates)
+        if not dates:
+            return []
+
+        # Same 3 AM local reference as __post_init__
+        three_am = Time(
+            [
+                datetime.fromisoformat(d).replace(hour=3, minute=0, second=0, tzinfo=local_tz)
+                for d in dates
+            ],
+            scale="utc",
+        )
+        sunset = observer.sun_set_time(three_am, which="next")
+        sunrise = observer.sun_rise_time(three_am, which="next")
+        evening = observer.twilight_evening_nautical(three_am, which="next")
+        morning = observer.twilight_morning_nautical(evening, which="next")
+
+        def _both(t):
+            return t.to_datetime(timezone=pytz.UTC), t.to_datetime(timezone=local_tz)
+
+        sunset_utc, sunset_local = _both(sunset)
+        sunrise_utc, sunrise_local = _both(sunrise)
+        evening_utc, evening_local = _both(evening)
+        morning_utc, morning_local = _both(morning)
+
+        out = []
+        for k, d in enumerate(dates):
+            # Fields are filled directly; __post_init__ would re-solve per day.
+            tw = cls.__new__(cls)
+            tw.date = d
+            tw.local_timezone = local_tz
+            tw.observer = observer
+            tw.sunset_utc, tw.sunset_local = sunset_utc[k], sunset_local[k]
+            tw.sunrise_utc, tw.sunrise_local = sunrise_utc[k], sunrise_local[k]
+            tw.evening_twilight_utc, tw.evening_twilight_local = evening_utc[k], evening_local[k]
+            tw.morning_twilight_utc, tw.morning_twilight_local = morning_utc[k], morning_local[k]
+            tw.daylight_hours = (tw.sunset_local - tw.sunrise_local).total_seconds() / 3600.0
+            out.append(tw)
+        return out
 
 if __name__ == "__main__":
     # Example usage
@@ -1,13 +1,24 @@
 # validate_prophet.py
 import pandas as pd
 import numpy as np
-from sklearn.metrics import mean_squared_error, mean_absolute_error
 # from scipy.signal import savgol_filter
 from dataclasses import dataclass, asdict
 from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+from pathlib import Path
+import hashlib
 import json
+import os
 import pytz
 import concurrent.futures
+import itertools
+import math
+
+try:
+    # loky (bundled with joblib) keeps worker processes alive between sweeps
+    from joblib.externals.loky import get_reusable_executor
+except ImportError:  # pragma: no cover - fall back to a fresh ProcessPool per sweep
+    get_reusable_executor = None
 
 
 import logging
@@ -15,6 +26,13 @@ logging.getLogger("cmdstanpy").setLevel(logging.DEBUG)
 
 local_tz = pytz.timezone("America/Santiago")
 
+# Fitted models kept in a model cache directory (oldest pruned beyond this)
+MODEL_CACHE_MAX_FILES = 64
+
+# Twilight flags carried through to the forecast output (always plain bool)
+FLAG_COLUMNS = ['is_evening_twilight', 'is_morning_twilight']
+
+
 class ProphetTwilightValidator:
     """
     Validate Prophet on temperature data by sweeping:
@@ -26,28 +44,80 @@ class ProphetTwilightValidator:
 
     Parameters
     ----------
-    df : DataFrame
-        Must contain columns:
+    df : DataFrame or path
+        A CSV path is read with read_data(). A DataFrame must contain columns:
           • 'ds'  (datetime, *timezone-naive local time*)
           • 'y'   (temperature target)
           • 'is_evening_twilight'  (bool flag)
+    model_cache_dir : path, optional
+        If given, fitted models are stored there (Prophet JSON) keyed by a hash of
+        the training data, changepoints and fit settings, and reused instead of
+        refitting when the same training window comes up again. That happens in
+        grid sweeps: the training slice does not depend on window_days, so every
+        window length of a (twilight, offset) pair shares one fit, as do repeated
+        sweeps. A rolling forecast trains on a new window every tick and would
+        never hit.
+    uncertainty_samples : int
+        Monte Carlo draws Prophet uses for yhat_lower/yhat_upper (Prophet's default
+        is 1000). 100 makes predict() much cheaper; yhat is unaffected, the interval
+        bounds just get noisier. 0 disables intervals.
+    warm_start_path : path, optional
+        If given, the parameters of the last fitted model are saved there (JSON)
+        and used as the optimizer's starting point for the next fit. The saved
+        parameters only apply when the new model has the same number of
+        changepoints; a different changepoint set invalidates the warm start
+        and the fit starts from Prophet's default init.
+    daily_fourier_order, monthly_fourier_order : int
+        Fourier orders of the daily and the custom 3-day ('monthly') seasonalities.
+        Each order adds two regressors to the Stan design matrix; 4 keeps the fit
+        cheap. evaluate_latest_window can override them per call for tuning sweeps.
     """
 
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, model_cache_dir=None, uncertainty_samples: int = 100,
+                 warm_start_path=None, daily_fourier_order: int = 4,
+                 monthly_fourier_order: int = 4):
         if df is None:
             raise ValueError("Must provide a DataFrame as input")
+        filename = None
+        if isinstance(df, (str, Path)):
+            filename = df
+            df = self.read_data(filename)
         if 'ds' not in df.columns or 'y' not in df.columns:
             df = self.prepare_df(df)
 
         self.df = df
-        self.df['is_evening_twilight'] = self.df['is_evening_twilight'].astype(bool)
-        self.df['is_morning_twilight'] = self.df['is_morning_twilight'].astype(bool)
+        # missing flags mean "not twilight"; stored as NumPy bool from here on
+        for col in FLAG_COLUMNS:
+            self.df[col] = self.df[col].fillna(False).to_numpy(dtype=bool)
         
-        self.filename = None  # optional, for reference
+        self.filename = filename  # optional, for reference
         self.set_sunrise_twilight_times()
+        # Sorted datetime64 arrays for binary-search range queries
+        self._ds_ns = self.df['ds'].to_numpy(dtype='datetime64[ns]')
+        self._sunrise_ns = self.sunrise_times.to_numpy(dtype='datetime64[ns]')
+        # ds-indexed view for aligning forecasts with observations
+        self._df_indexed = self.df.set_index('ds')
         self.set_changepoints()
         self.last_model  = None   # cache last model
         self.last_result = None   # cache last result
+        self.model_cache_dir = Path(model_cache_dir) if model_cache_dir is not None else None
+        self.uncertainty_samples = uncertainty_samples
+        self.warm_start_path = Path(warm_start_path) if warm_start_path is not None else None
+        self.fourier_orders = (daily_fourier_order, monthly_fourier_order)
+
+    def worker_settings(self) -> dict:
+        """
+        Constructor settings that run_grid_parallel workers rebuild their own
+        validator with. warm_start_path is left out on purpose: concurrent fits
+        of different windows would keep overwriting each other's start point.
+        """
+        daily_order, monthly_order = self.fourier_orders
+        return dict(
+            model_cache_dir=self.model_cache_dir,
+            uncertainty_samples=self.uncertainty_samples,
+            daily_fourier_order=daily_order,
+            monthly_fourier_order=monthly_order,
+        )
 
     # ------------------------------------------------------------------
     # helpers
@@ -72,14 +142,15 @@ class ProphetTwilightValidator:
 
     @staticmethod
     def _error_metrics(y_true, y_pred):
-        isnan = np.isnan(y_true) | np.isnan(y_pred)
-        y_true = y_true[~isnan]
-        y_pred = y_pred[~isnan]
-        rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-        mae  = mean_absolute_error(y_true, y_pred)
+        diff = np.asarray(y_true, dtype=float) - np.asarray(y_pred, dtype=float)
+        d = diff[~np.isnan(diff)]       # NaN in either input → NaN diff
+        if d.size == 0:
+            return np.nan, np.nan
+        rmse = np.sqrt(np.dot(d, d) / d.size)
+        mae  = np.abs(d).mean()
         return rmse, mae
 
-    def _train_prophet(self, train_df, offset_hour=2):
+    def _train_prophet(self, train_df, offset_hour=2, fourier_orders=None):
         train_df = train_df.copy()
         if train_df[["ds", "y"]].isna().any().any():
             raise ValueError("Training data contains NaNs")
@@ -95,50 +166,95 @@ class ProphetTwilightValidator:
         else:
             n_changepoints = 25
         # n_changepoints = 5
-        m = Prophet(yearly_seasonality=False, daily_seasonality=True,
-                    weekly_seasonality=False, changepoint_range=0.95,
-                    changepoint_prior_scale=0.05,
-                    changepoints=cpoints,
-                    n_changepoints=n_changepoints)
+        fourier_orders = tuple(fourier_orders or self.fourier_orders)
+        key = self._model_key(train_df, cpoints, n_changepoints,
+                              self.uncertainty_samples, fourier_orders)
+        return load_or_compute(
+            self._model_cache_path(key),
+            lambda: self._fit_warm(train_df, cpoints, n_changepoints, fourier_orders),
+        )
+
+    def _fit_warm(self, train_df, cpoints, n_changepoints, fourier_orders):
+        """Fit Prophet, starting from the saved parameters if they are compatible."""
+        n_delta = len(cpoints) if cpoints else n_changepoints
+        n_beta = 2 * sum(fourier_orders)
+        init = load_warm_start(self.warm_start_path, n_delta, n_beta)
+        m = self._fit_prophet(train_df, cpoints, n_changepoints,
+                              self.uncertainty_samples, init=init,
+                              fourier_orders=fourier_orders)
+        save_warm_start(self.warm_start_path, m, n_history=len(train_df))
+        return m
+
+    def _model_cache_path(self, key):
+        if self.model_cache_dir is None:
+            return None
+        return self.model_cache_dir / f"prophet_{key}.json"
+
+    @staticmethod
+    def _model_key(train_df, cpoints, n_changepoints, uncertainty_samples, fourier_orders):
+        """Hash of everything the fit depends on (data, changepoints, settings)."""
+        h = hashlib.sha1()
+        h.update(pd.util.hash_pandas_object(train_df[["ds", "y"]], index=False).values.tobytes())
+        h.update(repr((tuple(cpoints or ()), n_changepoints,
+                       uncertainty_samples, tuple(fourier_orders))).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _fit_prophet(train_df, cpoints, n_changepoints, uncertainty_samples=100, init=None,
+                     fourier_orders=(4, 4)):
+        daily_order, monthly_order = fourier_orders
+        m = Prophet(yearly_seasonality=False, daily_seasonality=daily_order,
+                        weekly_seasonality=False, changepoint_range=0.95,
+                        changepoint_prior_scale=0.05,
+                        changepoints=cpoints,
+                        n_changepoints=n_changepoints,
+                        uncertainty_samples=uncertainty_samples)
 
         # Add custom weekly seasonality with controlled flexibility
         m.add_seasonality(
             name='monthly',
             period=3,
-            fourier_order=8,
+            fourier_order=monthly_order,
             prior_scale=0.05  # <-- tweak this
         )
 
         # if offset_hour>5:
         # m.add_seasonality(name='daylight', period=0.75, fourier_order=13)
 
-        m.fit(train_df[["ds", "y"]])
+        if init is not None:
+            m.fit(train_df[["ds", "y"]], init=init)
+        else:
+            m.fit(train_df[["ds", "y"]])
         return m
     
     def get_changepoints(self, start, end):
-        if not hasattr(self, 'changepoints'):
+        if not hasattr(self, '_cp_union'):
             return None
-        # Filter changepoints to be within [start, end]
-        cp = [start]
-        for key, times in self.changepoints.items():
-            filtered = times[(times >= start) & (times <= end)]
-            cp.extend(filtered.tolist())
-        return sorted(cp)
+        # Changepoints within [start, end] by binary search on the sorted union
+        lo = np.searchsorted(self._cp_union, np.datetime64(pd.Timestamp(start).to_datetime64(), 'ns'))
+        hi = np.searchsorted(self._cp_union, np.datetime64(pd.Timestamp(end).to_datetime64(), 'ns'),
+                             side='right')
+        return [start] + list(pd.DatetimeIndex(self._cp_union[lo:hi]))
 
     def read_data(self, filename):
-        df = pd.read_csv(filename, index_col=0)
-        df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize('UTC').dt.tz_convert(local_tz)
+        # Arrow's multithreaded parser; timestamps come back as datetime64 directly
+        df = pd.read_csv(filename, index_col=0, engine='pyarrow', parse_dates=['timestamp'])
+        ts = pd.to_datetime(df['timestamp'])
+        if ts.dt.tz is None:
+            ts = ts.dt.tz_localize('UTC')               # naive timestamps are UTC
+        df['timestamp'] = ts.dt.tz_convert(local_tz)
         df['y'] = df['mean']
         df['ds'] = df['timestamp'].dt.tz_localize(None)  # make tz-naive
+        # keeps only rows with a real target (and complete min/max/flags)
         df = df[['ds', 'y', 'min', 'max', 'is_evening_twilight', 'is_morning_twilight']].dropna()
         df = df.sort_values("ds").reset_index(drop=True)
-        df = df.dropna(subset=['ds', 'y'])          # keep only rows with real target
         return df
     
     def fit(self, day_str: str, window_days: int = 7, offset_hr: int = 2):
-        day = pd.to_datetime(day_str).date()
-        day_mask = self.df['ds'].dt.date == day
-        train_df = self.df[day_mask]
+        # self.df is sorted by ds: slice the day by binary search
+        day = np.datetime64(pd.Timestamp(day_str).normalize().to_datetime64(), 'ns')
+        lo, hi = np.searchsorted(self._ds_ns, [day, day + np.timedelta64(1, 'D')])
+        train_df = self.df.iloc[lo:hi]
         # get evening_twilight time for that day
         tw_time = train_df.loc[train_df['is_evening_twilight'], 'ds'].iloc[-1]
         print(f"Evaluating Prophet for evening twilight at {tw_time} ")
@@ -155,15 +271,38 @@ class ProphetTwilightValidator:
         offset_hr  : forecasting offset (hours BEFORE twilight)
         Returns    : (rmse, mae, twilight_abs_err)
 
-        Skips evaluation if forecast horizon exceeds 24 hours or periods > 96 (24h at 15-min steps).
+        Skips evaluation if forecast horizon exceeds 24 hours or periods > 96 (24h at 15-min steps);
+        these checks run before the fit.
         """
+        # ----- 0.  forecast range: validate before paying for a fit --
+        end         = tw_time - pd.Timedelta(hours=offset_hr)  # forecast origin
+        horizon_end = tw_time + pd.Timedelta(hours=3)
+        periods     = int((horizon_end - end) / pd.Timedelta(minutes=15))
+        # Skip if horizon longer than 24 hours to avoid excessive forecasts
+        if horizon_end - end > pd.Timedelta(hours=24):
+            self.last_model = None
+            self.last_result = None
+            print("Forecast horizon exceeds 24 hours, skipping evaluation")
+            return None
+        # Skip if periods > 96 (24h worth of 15-min steps)
+        if periods > 96:
+            self.last_model = None
+            self.last_result = None
+            print("Forecast periods exceed 96 (24h at 15-min), skipping evaluation")
+            return None
+
         # ----- 1.  define train window ------------------------------
-        end   = tw_time - pd.Timedelta(hours=offset_hr)        # forecast origin
         # start = end - pd.Timedelta(days=window_days) - pd.Timedelta(hours=3)  # add 1h buffer
         # start should be the sunrise time of the -windows days
-        sunrise_times_before_tw = self.sunrise_times[self.sunrise_times < end]
-        start = sunrise_times_before_tw.min()
-        train = self.df[(self.df.ds >= start) & (self.df.ds < end)]
+        # (earliest sunrise, if it precedes the origin; sorted arrays → searchsorted)
+        end_ns = np.datetime64(pd.Timestamp(end).to_datetime64(), 'ns')
+        if len(self._sunrise_ns) and self._sunrise_ns[0] < end_ns:
+            start = self._sunrise_ns[0]
+            lo = np.searchsorted(self._ds_ns, start, side='left')
+            hi = np.searchsorted(self._ds_ns, end_ns, side='left')
+        else:
+            start, lo, hi = pd.NaT, 0, 0
+        train = self.df.iloc[lo:hi]
 
         if len(train) < 2 * 96:          # need ≥2 days (96*15-min samples)
             # print("Not enough training data for the given window_days")
@@ -182,21 +321,9 @@ class ProphetTwilightValidator:
             return None
 
         # ----- 3.  build future up to tw_time + 3 h -----------------
-        horizon_end = tw_time + pd.Timedelta(hours=3)
-        periods     = int((horizon_end - end) / pd.Timedelta(minutes=15))
-        # Skip if horizon longer than 24 hours to avoid excessive forecasts
-        if horizon_end - end > pd.Timedelta(hours=24):
-            self.last_model = None
-            self.last_result = None
-            print("Forecast horizon exceeds 24 hours, skipping evaluation")
-            return None
-        # Skip if periods > 96 (24h worth of 15-min steps)
-        if periods > 96:
-            self.last_model = None
-            self.last_result = None
-            print("Forecast periods exceed 96 (24h at 15-min), skipping evaluation")
-            return None
-        future      = model.make_future_dataframe(periods=periods, freq="15min")
+        # only the forecast range is scored, so don't predict on the history;
+        # start on the data's 15-min grid (twilight times, and so `end`, are not on it)
+        future      = pd.DataFrame({'ds': pd.date_range(end.ceil("15min"), horizon_end, freq="15min")})
         forecast    = model.predict(future)
 
         # ----- 4.  actual observations in same range ---------------
@@ -204,11 +331,8 @@ class ProphetTwilightValidator:
         # valid      = self.df.loc[valid_mask]
 
         # merged = self.df.merge(forecast, on="ds", how="right")
-        merged = forecast.merge(self.df, on='ds', how='left')
-        bool_cols = ['is_evening_twilight', 'is_morning_twilight']
-        for col in bool_cols:
-            if col in merged.columns:
-                merged[col] = pd.Series(merged[col], dtype="boolean").fillna(False).astype(bool)
+        merged = forecast.set_index('ds').join(self._df_indexed, how='left').reset_index()
+        fill_flags(merged)
         if merged.empty:
             self.last_model = None
             self.last_result = None
@@ -218,8 +342,11 @@ class ProphetTwilightValidator:
         rmse, mae = self._error_metrics(merged.y, merged.yhat)
 
         # absolute error **at exact twilight**
-        tw_val  = merged.loc[merged.ds == tw_time, :]
-        tw_err  = tw_val.y.iloc[0] - tw_val.yhat.iloc[0] if not tw_val.empty else np.nan
+        merged_ds = merged['ds'].to_numpy(dtype='datetime64[ns]')   # sorted (forecast grid)
+        tw_ns   = np.datetime64(pd.Timestamp(tw_time).to_datetime64(), 'ns')
+        k       = np.searchsorted(merged_ds, tw_ns)
+        found   = k < len(merged_ds) and merged_ds[k] == tw_ns
+        tw_err  = merged.y.iloc[k] - merged.yhat.iloc[k] if found else np.nan
 
         results = ProphetResult(
             mae=mae,
@@ -233,10 +360,11 @@ class ProphetTwilightValidator:
         self.last_model  = model    # cache last model
         return merged
 
-    def evaluate_latest_window(self, offset_hr: int = 0):
+    def evaluate_latest_window(self, offset_hr: int = 0, fourier_orders=None):
         """
         Fit Prophet using all data up to the last valid y, then forecast for all periods
         where y is NaN (including up to df.index.max()).
+        `fourier_orders` = (daily, monthly) overrides the validator's orders for this fit.
         Returns a DataFrame with actual and predicted values merged.
         """
         minDs = self.df.dropna(subset=['y','ds'])['ds'].min()
@@ -257,7 +385,7 @@ class ProphetTwilightValidator:
             return None
 
         # 3. Fit Prophet
-        model = self._train_prophet(train)
+        model = self._train_prophet(train, fourier_orders=fourier_orders)
         if model is None:
             print("Prophet model training failed")
             return None
@@ -271,14 +399,15 @@ class ProphetTwilightValidator:
         forecast = model.predict(future)
 
         # 6. Merge forecast with self.df (left join on 'ds')
-        merged = pd.merge(forecast, self.df, on='ds', how='left', suffixes=('_pred', '_obs'))
+        merged = (
+            forecast.set_index('ds')
+            .join(self._df_indexed, how='left', lsuffix='_pred', rsuffix='_obs')
+            .reset_index()
+        )
         # merged['y'][merged['ds']>end] = np.nan
 
         # 7. For rows where y is NaN but yhat is present, this is a forecasted value
-        bool_cols = ['is_evening_twilight', 'is_morning_twilight']
-        for col in bool_cols:
-            if col in merged.columns:
-                merged[col] = merged[col].fillna(False).astype(bool)        
+        fill_flags(merged)
         
         # 8. Adjust trends
         # # twtime = merged.loc[merged['is_evening_twilight'], 'ds'].max()
@@ -308,6 +437,9 @@ class ProphetTwilightValidator:
             "midnight": sunset + pd.Timedelta(hours=6),
             "midnight2": sunset + pd.Timedelta(hours=3),
         }
+        # All changepoints as one sorted array for get_changepoints
+        self._cp_union = np.sort(np.concatenate(
+            [t.to_numpy(dtype='datetime64[ns]') for t in self.changepoints.values()]))
 
     def prepare_df(self, rolling_df):
         rolling_df['y'] = rolling_df['mean']
@@ -349,88 +481,283 @@ class ProphetTwilightValidator:
         ]].copy()
 
         # - timestamps as ISO-8601 local-time strings (with UTC offset)
-        if pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-            df["timestamp"] = (
-                pd.to_datetime(df["timestamp"])
-                .dt.tz_localize("America/Santiago", nonexistent="shift_forward", ambiguous="NaT")
-                .dt.strftime("%Y-%m-%dT%H:%M:%S%z")
-            )
-
         chile_tz = pytz.timezone("America/Santiago")
         if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
             df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-        
+
         if df["timestamp"].dt.tz is None:
-            # Assume it is UTC, localize and convert
-            df["timestamp"] = df["timestamp"].dt.tz_localize("UTC").dt.tz_convert(chile_tz)
+            # Prophet's ds is naive Chile local time
+            df["timestamp"] = df["timestamp"].dt.tz_localize(
+                chile_tz, nonexistent="shift_forward", ambiguous="NaT")
         else:
             df["timestamp"] = df["timestamp"].dt.tz_convert(chile_tz)
-        # Format with offset (add colon in offset)
-        df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S%z")
-        df["timestamp"] = df["timestamp"].str.replace(r'(\d{2})(\d{2})$', r'\1:\2', regex=True)
+        # Format with offset (add colon in offset: -0300 → -03:00)
+        ts = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S%z")
+        df["timestamp"] = ts.str.slice(0, -2) + ":" + ts.str.slice(-2)
 
         # ensure sunset is “true/false” lowercase (so JS .toLowerCase() works)
-        df["sunset"] = df["sunset"].astype(bool).map({True: "true", False: "false"})
-        df["sunrise"] = df["sunrise"].astype(bool).map({True: "true", False: "false"})
+        df["sunset"] = np.where(df["sunset"].to_numpy(dtype=bool), "true", "false")
+        df["sunrise"] = np.where(df["sunrise"].to_numpy(dtype=bool), "true", "false")
 
         # 3. round temps to 2 decimals (match tooltip format) ---------------
         for col in ["tmin", "tmean", "tmax", "tpmin", "tprophet", "tpmax", "trend-weekly"]:
             df[col] = df[col].astype(float).round(2)
 
         # 4. write ----------------------------------------------------------
-        df.to_csv(out_path, index=False)
+        from helper import atomic_write
+        atomic_write(out_path, lambda tmp: df.to_csv(tmp, index=False))
         print(f"✅ wrote {len(df):,} rows → {out_path}")
 
 
+def fill_flags(merged):
+    """
+    Set the twilight flags of forecast rows with no observation to False, in place.
+    Columns that came through the join without gaps are already bool and are left alone.
+    """
+    for col in FLAG_COLUMNS:
+        if col in merged.columns and merged[col].dtype != bool:
+            merged[col] = merged[col].fillna(False).to_numpy(dtype=bool)
+    return merged
+
+
+def load_or_compute(path, compute):
+    """
+    Return the Prophet model stored at `path`, or fit it with `compute()` and
+    store it there. With `path=None` the model is always computed.
+    """
+    if path is None:
+        return compute()
+    path = Path(path)
+    if path.exists():
+        try:
+            return model_from_json(path.read_text())
+        except Exception as exc:  # corrupt/incompatible entry → refit
+            print(f"[WARN] Ignoring cached model {path.name}: {exc}")
+
+    model = compute()
+    if model is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(model_to_json(model))
+        tmp.replace(path)
+        _prune_model_cache(path.parent)
+    return model
+
+
+def warm_start_params(m):
+    """Point estimates of a fitted model's parameters, in Prophet's `init` format."""
+    res = {}
+    for pname in ['k', 'm', 'sigma_obs']:
+        res[pname] = float(np.mean(m.params[pname]))
+    for pname in ['delta', 'beta']:
+        res[pname] = np.mean(m.params[pname], axis=0).tolist()
+    return res
+
+
+def load_warm_start(path, n_delta, n_beta):
+    """
+    Return the init dict saved at `path`, or None if there is none or it was
+    fitted with a different number of changepoints or seasonality regressors.
+    """
+    if path is None or not Path(path).exists():
+        return None
+    try:
+        saved = json.loads(Path(path).read_text())
+    except Exception as exc:  # corrupt entry → cold start
+        print(f"[WARN] Ignoring warm start {Path(path).name}: {exc}")
+        return None
+    if saved.get("n_changepoints") != n_delta or saved.get("n_beta") != n_beta:
+        return None
+    return saved["params"]
+
+
+def save_warm_start(path, m, n_history):
+    if path is None or m is None:
+        return
+    params = warm_start_params(m)
+    entry = {
+        "n_changepoints": len(params["delta"]),
+        "n_beta": len(params["beta"]),
+        "n_history": n_history,
+        "params": params,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(entry))
+    tmp.replace(path)
+
+
+def _prune_model_cache(cache_dir: Path, keep: int = MODEL_CACHE_MAX_FILES):
+    # scandir: file type from the dirent, no Path object per entry
+    with os.scandir(cache_dir) as it:
+        files = [(e.stat().st_mtime, e.path) for e in it
+                 if e.name.startswith("prophet_") and e.name.endswith(".json")
+                 and e.is_file(follow_symlinks=False)]
+    if len(files) <= keep:
+        return
+    files.sort()
+    for _, old in files[:-keep]:
+        try:
+            os.unlink(old)
+        except FileNotFoundError:  # pruned concurrently by another worker
+            pass
+
+
+# Per-worker validator for run_grid_parallel (set by _init_worker)
+_VAL = None
+
+# loky executor kept alive between run_grid_parallel sweeps
+_EXECUTOR = None
+
+
+def shutdown_grid_workers(wait=True):
+    """Shut down the worker processes run_grid_parallel keeps for reuse (if any)."""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=wait)
+        _EXECUTOR = None
+
+
+def _init_worker(csv_path, settings=None):
+    """
+    ProcessPool initializer: load the data once per worker process.
+
+    `settings` are ProphetTwilightValidator keyword arguments (see
+    ProphetTwilightValidator.worker_settings) so workers fit with the same
+    configuration as the parent validator.
+    """
+    global _VAL
+    _VAL = ProphetTwilightValidator(csv_path, **(settings or {}))
+
+
 def _one_eval(args):
     """
-    Run a single (twilight, window, offset) evaluation in a subprocess.
+    Run a single (twilight, window, offset) evaluation in a worker process.
+
+    Uses the worker's validator built by _init_worker.
 
     Parameters
     ----------
     args : tuple
-        (csv_path, twilight_iso, window_days, offset_hr)
+        (twilight_iso, window_days, offset_hr)
 
     Returns
     -------
     dict or None
         Metrics dict from ProphetResult, or None if eval skipped.
     """
-    csv_path, tw_iso, window_days, offset_hr = args
-    val = ProphetTwilightValidator(csv_path)        # new instance
+    tw_iso, window_days, offset_hr = args
     tw_time = pd.to_datetime(tw_iso)
-    merged = val._evaluate_one(tw_time, window_days, offset_hr)
-    if val.last_result is None:
+    _VAL.last_result = None
+    merged = _VAL._evaluate_one(tw_time, window_days, offset_hr)
+    if _VAL.last_result is None:
         return None
     # Return only the metrics, not a DataFrame!
-    metrics = val.last_result.to_dict()
+    metrics = _VAL.last_result.to_dict()
     metrics["id"] = 0  # placeholder, could be improved
     return metrics
 
+def _eval_chunk(items):
+    """
+    Run a chunk of grid tasks in a worker process.
+
+    Parameters
+    ----------
+    items : list of (task_index, (twilight_iso, window_days, offset_hr))
+
+    Returns
+    -------
+    list of (task_index, metrics dict) for the evaluations that succeeded.
+    """
+    out = []
+    for k, task in items:
+        res = _one_eval(task)
+        if res is not None:
+            out.append((k, res))
+    return out
+
+def _task_chunks(tasks, max_workers, chunks_per_worker=4):
+    """
+    Split tasks into consecutive chunks of ceil(n / (chunks_per_worker * max_workers)),
+    as (task_index, task) lists: about `chunks_per_worker` chunks per worker, so
+    submission/pickling is paid per chunk while a slow chunk still can't hold
+    back the sweep by more than a small share of one worker's load.
+    """
+    size = max(1, math.ceil(len(tasks) / (chunks_per_worker * max_workers)))
+    indexed = list(enumerate(tasks))
+    return [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
 def run_grid_parallel(
         self,
         window_grid=(3, 5, 7),
         offset_grid=(0, 2, 4, 8),
-        max_workers=4):
+        max_workers=None):
     """
-    Parallel sweep using ProcessPool.
-    Returns a DataFrame of metric rows.
+    Parallel sweep using a process pool.
+    Returns a DataFrame of metric rows (in task order).
+
+    Tasks are submitted in chunks of consecutive tasks (about four per worker,
+    see _task_chunks); chunks are collected as they complete.
+    Each worker loads `self.filename` once (initializer), not once per task.
+    With joblib installed the pool is loky's reusable executor, so repeated
+    sweeps over the same file reuse the already-initialized workers. Those
+    workers (each holding a validator) stay alive after the sweep until
+    shutdown_grid_workers() is called, loky's idle timeout (300 s) expires, or a
+    sweep with another file/settings makes loky replace them.
+    The validator must have been built from a CSV path: workers reload the data
+    from `self.filename`.
+    `max_workers` defaults to the CPU count, capped by the number of tasks.
     """
-    # Build task list for every twilight × window × offset
-    tasks = [(self.filename, tw.isoformat(), w, h)
+    if self.filename is None:
+        raise ValueError("run_grid_parallel needs a validator built from a CSV path "
+                         "(workers reload the data from it); this one was built from a DataFrame.")
+
+    # Prune combos _evaluate_one would reject anyway: horizon (offset + 3 h)
+    # beyond 24 h, or a forecast origin < 2 days after the first sunrise
+    # (fewer than 2*96 15-min training samples)
+    offsets = [h for h in offset_grid if h + 3 <= 24]
+    first_sunrise = self.sunrise_times.min()
+    min_origin = first_sunrise + pd.Timedelta(days=2)
+
+    # Build task list for every feasible twilight × window × offset
+    tasks = [(tw.isoformat(), w, h)
              for tw in self.twilight_times
              for w in window_grid
-             for h in offset_grid]
+             for h in offsets
+             if tw - pd.Timedelta(hours=h) >= min_origin]
+    if not tasks:
+        raise RuntimeError("No feasible (twilight, window, offset) combos – check data.")
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(tasks)))
+    chunks = _task_chunks(tasks, max_workers)
+
+    pool_kwargs = dict(max_workers=max_workers,
+                       initializer=_init_worker,
+                       initargs=(self.filename, self.worker_settings()))
+    global _EXECUTOR
+    if get_reusable_executor is not None:
+        # not shut down here: kept for the next sweep (see shutdown_grid_workers)
+        ex = _EXECUTOR = get_reusable_executor(**pool_kwargs)
+    else:
+        ex = concurrent.futures.ProcessPoolExecutor(**pool_kwargs)
+
+    try:
+        futures = [ex.submit(_eval_chunk, items) for items in chunks]
+        results = []
+        for n, fut in enumerate(concurrent.futures.as_completed(futures), start=1):
+            results.append(fut.result())
+            print(f"[{n}/{len(chunks)}] grid chunks finished", end="\r")
+        done = list(itertools.chain.from_iterable(results))
+    finally:
+        if get_reusable_executor is None:
+            ex.shutdown()
 
     rows = []
-    i = 0
-    with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers) as ex:
-        for res in ex.map(_one_eval, tasks):
-            if res is not None:
-                res['id'] = i
-                i+=1
-                rows.append(res)
+    for i, (_, res) in enumerate(sorted(done, key=lambda kv: kv[0])):
+        res['id'] = i
+        rows.append(res)
 
     if not rows:
         raise RuntimeError("No successful Prophet fits – check data.")
@@ -11,7 +11,7 @@ def banner(msg):
     print(f" {msg} ".center(58, "="))
     print("=" * 60 + "\n")
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Run forecast pipeline for a rolling window ending at the specified date.")
     parser.add_argument(
         "--now",
@@ -19,7 +19,7 @@ def main():
         default=None,
         help="Current date/time for rolling window end (format: YYYY-MM-DD or YYYY-MM-DDTHH:MM, Chilean time). Defaults to now.",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     tz_chile = pytz.timezone("America/Santiago")
     if args.now:
@@ -46,7 +46,12 @@ def main():
     nan_count = rolling_df['mean'].isna().sum().sum()
     print(f"[INFO] Rolling window contains {nan_count} NaN values before forecasting.")
     
-    validator = ProphetTwilightValidator(rolling_df)
+    # Fits are warm-started from the previous tick's parameters. No model cache:
+    # the training window rolls every tick, so a cached fit would never be reused.
+    validator = ProphetTwilightValidator(
+        rolling_df,
+        warm_start_path=handler.cache_dir / "prophet_warm_start.json",
+    )
     merged = validator.evaluate_latest_window(offset_hr=0)
     # merged = validator.apply_kalman_filter(merged)
 
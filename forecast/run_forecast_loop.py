@@ -1,15 +1,21 @@
-import subprocess
 import time
+import traceback
 from datetime import datetime, timedelta
-import pytz
-TZ_CHILE = pytz.timezone("America/Santiago")
+from zoneinfo import ZoneInfo
+
+from update_hourly_forecast import main as update_hourly_forecast_main
+from run_forecast import main as run_forecast_main
+from send_data_to_api import main as send_data_to_api_main
+
+TZ_CHILE = ZoneInfo("America/Santiago")
 
 PIPELINE_FREQ_MIN = 15  # update every 15 minutes
 
-commands = [
-    "python update_hourly_forecast.py",
-    "python run_forecast.py",
-    "python send_data_to_api.py"
+# Steps run in-process so imports and Prophet's compiled model stay warm between ticks
+steps = [
+    ("update_hourly_forecast", update_hourly_forecast_main),
+    ("run_forecast", lambda: run_forecast_main([])),
+    ("send_data_to_api", send_data_to_api_main),
 ]
 
 def log_banner(msg):
@@ -23,11 +29,14 @@ def log_step(msg):
 def run_once():
     now = datetime.now(TZ_CHILE).strftime("%Y-%m-%d %H:%M:%S CLT")
     log_banner(f"Forecast pipeline started at {now}")
-    for cmd in commands:
-        log_step(f"Running: {cmd}")
-        ret = subprocess.call(cmd, shell=True)
-        if ret != 0:
-            print(f"\n❌ [ERROR] Command failed: {cmd} (exit {ret})\n")
+    for name, step in steps:
+        log_step(f"Running: {name}")
+        try:
+            step()
+        except (Exception, SystemExit) as e:
+            # run_forecast signals failure through exit(1)
+            traceback.print_exc()
+            print(f"\n❌ [ERROR] Step failed: {name} ({e!r})\n")
             break
 
 def sleep_until_next_period(freq_min=15, minute_offset=1):
@@ -38,7 +47,8 @@ def sleep_until_next_period(freq_min=15, minute_offset=1):
         next_period = (now + timedelta(hours=1)).replace(minute=minute % 60, second=0, microsecond=0)
     else:
         next_period = now.replace(minute=minute, second=0, microsecond=0)
-    seconds = (next_period - now).total_seconds()
+    # via POSIX timestamps: same-tzinfo subtraction would ignore a DST change
+    seconds = next_period.timestamp() - now.timestamp()
     m, s = divmod(int(seconds), 60)
     print(f"\n😴 Sleeping {m} min {s} sec until next run at {next_period.strftime('%Y-%m-%d %H:%M:%S CLT')}\n")
     if seconds > 0:
@@ -1,37 +1,116 @@
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
 import requests
-from helper import DataFileHandler
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from helper import DataFileHandler, atomic_write
 from datetime import datetime, timezone
 
-handler = DataFileHandler()
-csv_path = handler.get_latest_path()
-url = "https://rubin-weather-forecast.jesteves.workers.dev/api/update"
-
-with open(csv_path, "r", encoding="utf-8") as f:
-    csv_data = f.read()
-
-# Add upload timestamp in UTC as a custom header
-upload_time_utc = datetime.now(timezone.utc).isoformat(timespec="seconds")
-headers = {
-    "Content-Type": "text/csv",
-    "X-Upload-Timestamp": upload_time_utc
-}
-
-response = requests.post(url, data=csv_data, headers=headers)
-
-if response.status_code != 200:
-    raise RuntimeError(f"Upload failed: {response.status_code} {response.text}")
-
-print("CSV uploaded successfully.")
-
-# Append metadata log after successful upload
-metadata_path = handler.base_dir / "upload_metadata.log"
-log_entry = {
-    "filename": str(csv_path),
-    "size_bytes": len(csv_data),
-    "upload_time_utc": upload_time_utc,
-    "status_code": response.status_code
-}
-with open(metadata_path, "a") as meta_file:
-    meta_file.write(json.dumps(log_entry) + "\n")
-print(f"Metadata log updated: {metadata_path}")
\ No newline at end of file
+try:
+    import orjson
+
+    def _dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:  # pragma: no cover - stdlib fallback
+    import json
+
+    def _dumps_line(obj) -> bytes:
+        return (json.dumps(obj) + "\n").encode()
+
+URL = "https://rubin-weather-forecast.jesteves.workers.dev/api/update"
+
+def make_session(retries=3, backoff=0.5, pool_size=8):
+    """requests Session with a bounded connection pool and retries on transient errors."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),  # the upload replaces the latest CSV: idempotent
+        # hand back the last response once retries run out, so main() can report its body
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                          max_retries=retry))
+    return session
+
+# Shared across main() calls: run_forecast_loop runs the upload in-process every
+# tick, so the TCP/TLS connection to the worker is kept alive between ticks
+_SESSION = None
+
+def get_session():
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = make_session()
+    return _SESSION
+
+def file_digest(path, chunk_size=1 << 20):
+    """BLAKE2b hex digest of a file, read in chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def gzip_file(src_path, dst, level=6):
+    """Gzip `src_path` chunk by chunk into the binary file object `dst`; return the bytes written."""
+    start = dst.tell()
+    with open(src_path, "rb") as src, gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=level) as gz:
+        shutil.copyfileobj(src, gz)
+    return dst.tell() - start
+
+def main():
+    handler = DataFileHandler()
+    csv_path = handler.get_latest_path()
+
+    # Skip the upload when the CSV is byte-identical to the last one sent
+    hash_path = handler.base_dir / "upload_last_hash"
+    digest = file_digest(csv_path)
+    if hash_path.exists() and hash_path.read_text().strip() == digest:
+        print("CSV unchanged since last upload; skipping.")
+        return
+
+    size_bytes = os.path.getsize(csv_path)
+    # Add upload timestamp in UTC as a custom header
+    upload_time_utc = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    # The CSV is numeric text and compresses ~10x; the worker gunzips it.
+    # The body goes to an anonymous temp file (removed on close), so
+    # overlapping runs never share it; it is streamed from there.
+    with tempfile.TemporaryFile(dir=handler.cache_dir) as body:
+        gzip_bytes = gzip_file(csv_path, body)
+        body.seek(0)
+        headers = {
+            "Content-Type": "text/csv",
+            "Content-Encoding": "gzip",
+            # explicit length so the streamed body is never sent chunked
+            "Content-Length": str(gzip_bytes),
+            "X-Upload-Timestamp": upload_time_utc
+        }
+        response = get_session().post(URL, data=body, headers=headers)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Upload failed: {response.status_code} {response.text}")
+
+    print("CSV uploaded successfully.")
+    atomic_write(hash_path, lambda tmp: tmp.write_text(digest))
+
+    # Append metadata log after successful upload
+    metadata_path = handler.base_dir / "upload_metadata.log"
+    log_entry = {
+        "filename": str(csv_path),
+        "size_bytes": size_bytes,
+        "gzip_bytes": gzip_bytes,
+        "blake2b": digest,
+        "upload_time_utc": upload_time_utc,
+        "status_code": response.status_code
+    }
+    with open(metadata_path, "ab") as meta_file:
+        meta_file.write(_dumps_line(log_entry))
+    print(f"Metadata log updated: {metadata_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+# The forecast scripts import each other by module name (e.g. `from helper import ...`).
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class _FakeTwilightTimes:
+    """Fixed UTC event offsets from each (local) day, so no ephemeris is needed."""
+
+    @classmethod
+    def batch(cls, dates):
+        out = []
+        for d in dates:
+            day = pd.Timestamp(d, tz="UTC")
+            out.append(SimpleNamespace(
+                sunrise_utc=day + pd.Timedelta("03:07:00"),
+                sunset_utc=day + pd.Timedelta("11:50:00"),
+                evening_twilight_utc=day + pd.Timedelta("20:00:00"),
+                morning_twilight_utc=day + pd.Timedelta("22:30:00"),
+            ))
+        return out
+
+
+@pytest.fixture
+def fake_twilight(monkeypatch):
+    import efd_temp_query
+    monkeypatch.setattr(efd_temp_query, "TwilightTimes", _FakeTwilightTimes)
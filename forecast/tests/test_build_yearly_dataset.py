@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+import build_yearly_dataset
+from helper import DataFileHandler, read_timestamped_parquet
+
+TZ_CHILE = pytz.timezone("America/Santiago")
+
+
+def _source_df():
+    # Feb..Jul in UTC across the April DST change, with no data for May
+    index = pd.date_range("2025-02-10", "2025-07-20", freq="15min", tz="UTC")
+    df = pd.DataFrame({"mean": np.arange(len(index), dtype=float)}, index=index)
+    df["max"] = df["mean"] + 0.5
+    local = df.index.tz_convert(TZ_CHILE)
+    gap = (local >= TZ_CHILE.localize(pd.Timestamp("2025-04-20"))) & (
+        local < TZ_CHILE.localize(pd.Timestamp("2025-06-01 00:15")))
+    return df[~gap]
+
+
+def _reference_month(df, month_start_local):
+    # per-month slice + reindex, as the script did before the shared grid
+    next_month = (month_start_local.tz_localize(None) + pd.offsets.MonthBegin(1))
+    slice_start = month_start_local - pd.Timedelta(days=7)
+    slice_end = TZ_CHILE.localize(next_month)
+    full_index = pd.date_range(start=slice_start, end=slice_end, freq="15min", tz=TZ_CHILE)
+    return df.loc[slice_start:slice_end].reindex(full_index)
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    handler = DataFileHandler(base_dir=tmp_path)
+    df = _source_df()
+    monkeypatch.setattr(build_yearly_dataset, "DataFileHandler", lambda: handler)
+    monkeypatch.setattr(handler, "read_source_df", lambda path: df.copy())
+    return handler, df
+
+
+def test_main_cuts_each_month_like_a_per_month_reindex(build, monkeypatch):
+    handler, df = build
+    monkeypatch.setattr(build_yearly_dataset, "ProcessPoolExecutor", ThreadPoolExecutor)
+    build_yearly_dataset.main()
+
+    written = sorted(p.parent.name for p in handler.archive_dir.glob("*/*.parquet"))
+    assert written == ["2025-03", "2025-04", "2025-06"]  # May has no data
+    for ym in written:
+        month_start = TZ_CHILE.localize(pd.Timestamp(f"{ym}-01"))
+        got = read_timestamped_parquet(handler.get_monthly_archive_path(month_start))
+        expected = _reference_month(df.tz_convert(TZ_CHILE), month_start).tz_convert("UTC")
+        pd.testing.assert_frame_equal(got, expected, check_freq=False, check_index_type=False)
+
+
+class _SourceHandler(DataFileHandler):
+    # module level (not a monkeypatched instance) so it pickles into the workers
+    def read_source_df(self, csv_path):
+        return _source_df()
+
+
+def test_main_writes_months_from_worker_processes(tmp_path, monkeypatch):
+    handler = _SourceHandler(base_dir=tmp_path)
+    monkeypatch.setattr(build_yearly_dataset, "DataFileHandler", lambda: handler)
+    build_yearly_dataset.main()
+
+    df = _source_df().tz_convert(TZ_CHILE)
+    written = sorted(handler.archive_dir.glob("*/*.parquet"))
+    assert [p.parent.name for p in written] == ["2025-03", "2025-04", "2025-06"]
+    for path in written:
+        month_start = TZ_CHILE.localize(pd.Timestamp(f"{path.parent.name}-01"))
+        expected = _reference_month(df, month_start).tz_convert("UTC")
+        pd.testing.assert_frame_equal(read_timestamped_parquet(path), expected,
+                                      check_freq=False, check_index_type=False)
+
+
+def test_write_month_creates_the_archive_directory(tmp_path):
+    handler = DataFileHandler(base_dir=tmp_path)
+    month = TZ_CHILE.localize(pd.Timestamp("2025-03-01"))
+    df = pd.DataFrame({"mean": [1.0, np.nan]},
+                      index=pd.date_range(month, periods=2, freq="15min").tz_convert("UTC"))
+
+    path = build_yearly_dataset.write_month(handler, df, month)
+
+    assert path == handler.get_monthly_archive_path(month) and path.exists()
+    pd.testing.assert_frame_equal(read_timestamped_parquet(path), df, check_freq=False)
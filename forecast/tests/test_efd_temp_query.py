@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from efd_temp_query import EFDTemperatureQuery, event_positions
+from helper import TWILIGHT_FLAG_COLUMNS
+
+
+@pytest.mark.parametrize("unit", ["ns", "us"])
+@pytest.mark.parametrize("fixed", [True, False])
+def test_event_positions_snaps_to_nearest_row(unit, fixed):
+    index = pd.date_range("2025-01-01", periods=8, freq="15min", tz="UTC", unit=unit)
+    if not fixed:
+        index = pd.DatetimeIndex(list(index))
+        assert index.freq is None
+    events = [
+        pd.Timestamp("2025-01-01 00:20", tz="UTC"),     # nearest 00:15
+        pd.Timestamp("2025-01-01 00:37:30", tz="UTC"),  # tie between 00:30 and 00:45 -> earlier
+        pd.Timestamp("2025-01-01 01:44", tz="UTC"),     # past the end, 01:45 within window
+    ]
+    assert event_positions(index, events, window_minutes=30).tolist() == [1, 2, 7]
+
+
+@pytest.mark.parametrize("fixed", [True, False])
+def test_event_positions_drops_events_outside_window(fixed):
+    index = pd.date_range("2025-01-01", periods=4, freq="15min", tz="UTC")
+    if not fixed:
+        index = pd.DatetimeIndex(list(index))
+    events = [
+        pd.Timestamp("2024-12-31 23:00", tz="UTC"),
+        pd.Timestamp("2025-01-01 00:44", tz="UTC"),
+        pd.Timestamp("2025-01-01 02:00", tz="UTC"),
+    ]
+    assert event_positions(index, events, window_minutes=30).tolist() == [3]
+
+
+def test_event_positions_empty_inputs():
+    index = pd.date_range("2025-01-01", periods=4, freq="15min", tz="UTC")
+    assert event_positions(index, [], window_minutes=30).size == 0
+    assert event_positions(index[:0], [index[0]], window_minutes=30).size == 0
+
+
+def _temperature_frame(start, periods):
+    index = pd.date_range(start, periods=periods, freq="15min", tz="UTC")
+    return pd.DataFrame({"mean": np.arange(periods, dtype=float)}, index=index)
+
+
+def _flagged(df, column):
+    return list(df.index[df[column]].strftime("%H:%M"))
+
+
+def test_set_twilight_flags_over_a_day(fake_twilight):
+    df = _temperature_frame("2025-01-02 00:00", 96)
+    query = EFDTemperatureQuery(df.index[0].to_pydatetime(), df.index[-1].to_pydatetime(),
+                                verbose=False)
+    df = query.set_twilight_flags(df)
+
+    assert _flagged(df, "is_sunrise") == ["03:00"]
+    assert _flagged(df, "is_sunset") == ["11:45"]
+    assert _flagged(df, "is_evening_twilight") == ["20:00"]
+    assert _flagged(df, "is_morning_twilight") == ["22:30"]
+
+
+def test_fetch_flags_events_once_across_the_cache_boundary(fake_twilight, monkeypatch):
+    # cached rows end at 11:45, fresh rows start at 12:00; sunset (11:50) sits
+    # within the window of both slices but must land only on 11:45
+    cached = _temperature_frame("2025-01-02 00:00", 48)
+    cached[TWILIGHT_FLAG_COLUMNS] = False
+    cached.loc[cached.index[47], "is_sunset"] = True
+    fresh = _temperature_frame("2025-01-02 12:00", 48)
+
+    query = EFDTemperatureQuery(fresh.index[0].to_pydatetime(), fresh.index[-1].to_pydatetime(),
+                                verbose=False)
+    monkeypatch.setattr(query, "_query_efd", lambda: fresh.copy())
+    df = query.fetch(cached=cached)
+
+    assert len(df) == 96
+    assert _flagged(df, "is_sunset") == ["11:45"]
+    assert _flagged(df, "is_sunrise") == ["03:00"]
+    assert _flagged(df, "is_evening_twilight") == ["20:00"]
+    assert _flagged(df, "is_morning_twilight") == ["22:30"]
+
+
+def test_fetch_prefers_fresh_values_over_cache(fake_twilight, monkeypatch):
+    cached = _temperature_frame("2025-01-02 00:00", 8)
+    fresh = _temperature_frame("2025-01-02 01:00", 8) + 100.0
+    query = EFDTemperatureQuery(fresh.index[0].to_pydatetime(), fresh.index[-1].to_pydatetime(),
+                                verbose=False)
+    monkeypatch.setattr(query, "_query_efd", lambda: fresh.copy())
+    df = query.fetch(cached=cached)
+
+    assert df["mean"].tolist() == [0.0, 1.0, 2.0, 3.0] + list(fresh["mean"])
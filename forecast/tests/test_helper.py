@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from helper import DataFileHandler, write_timestamped_csv, write_timestamped_parquet
+
+
+def test_read_source_df_treats_naive_timestamps_as_utc(tmp_path):
+    csv_path = tmp_path / "temps.csv"
+    csv_path.write_text(
+        "timestamp,temperature,is_evening_twilight,is_morning_twilight,is_sunset,is_sunrise\n"
+        "2025-01-01 00:00:00,12.5,False,False,True,False\n"
+        "2025-01-01 00:15:00,12.0,True,False,False,False\n"
+    )
+    df = DataFileHandler(base_dir=tmp_path / "data").read_source_df(csv_path)
+
+    assert str(df.index.tz) == "UTC"
+    assert df.index[0] == pd.Timestamp("2025-01-01 00:00", tz="UTC")
+    assert df["is_sunset"].dtype == bool
+    assert df["is_sunset"].tolist() == [True, False]
+
+
+def _source_frame():
+    index = pd.date_range("2025-01-01 00:00", periods=4, freq="15min", tz="UTC")
+    return pd.DataFrame(
+        {
+            "min": [10.0, None, 11.0, 11.5],
+            "mean": [10.5, None, 11.2, 11.8],
+            "max": [11.0, None, 11.4, 12.0],
+            "is_evening_twilight": [False, False, True, False],
+            "is_morning_twilight": [False, False, False, False],
+            "is_sunset": [True, False, False, False],
+            "is_sunrise": [False, False, False, True],
+        },
+        index=index,
+    )
+
+
+def test_read_source_df_round_trips_the_original_csv_format(tmp_path):
+    # Layout of the original EFDTemperatureQuery.to_csv (pandas writer, "Z" suffix)
+    expected = _source_frame()
+    csv_path = tmp_path / "temps.csv"
+    df_reset = expected.reset_index().rename(columns={"index": "timestamp"})
+    df_reset["timestamp"] = df_reset["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    df_reset.to_csv(csv_path, index=False)
+
+    df = DataFileHandler(base_dir=tmp_path / "data").read_source_df(csv_path)
+
+    pd.testing.assert_frame_equal(df, expected, check_index_type=False, check_freq=False,
+                                  check_names=False)
+    assert (tmp_path / "temps.csv.parquet").exists()
+
+
+def test_read_source_df_round_trips_write_timestamped_csv(tmp_path):
+    expected = _source_frame()
+    csv_path = tmp_path / "temps.csv"
+    write_timestamped_csv(expected, csv_path)
+
+    df = DataFileHandler(base_dir=tmp_path / "data").read_source_df(csv_path)
+
+    pd.testing.assert_frame_equal(df, expected, check_index_type=False, check_freq=False,
+                                  check_names=False)
+
+
+def test_update_monthly_archive_prefers_non_nan_cache_values(tmp_path):
+    handler = DataFileHandler(base_dir=tmp_path)
+    day = pytz.timezone("America/Santiago").localize(datetime(2025, 1, 2))
+
+    month_index = pd.date_range(day, periods=8, freq="15min").tz_convert("UTC")
+    monthly = pd.DataFrame({"mean": np.arange(8.0), "max": np.arange(8.0) + 1}, index=month_index)
+    handler.write_monthly(monthly, handler.get_monthly_archive_path(day))
+
+    # cache: overlaps rows 2-5 (row 3 still NaN), runs past the month frame,
+    # and carries a column the archive does not have
+    daily_index = pd.date_range(month_index[2], periods=8, freq="15min")
+    daily = pd.DataFrame(
+        {
+            "mean": [20.0, np.nan, 22.0, 23.0, 24.0, 25.0, 26.0, 27.0],
+            "max": [30.0, np.nan, 32.0, 33.0, 34.0, 35.0, 36.0, 37.0],
+            "extra": 1.0,
+        },
+        index=daily_index,
+    )
+    write_timestamped_parquet(daily, handler.get_daily_cache_path(day))
+
+    handler.update_monthly_archive(day)
+    updated = handler.read_monthly_df(day)
+
+    assert updated.index.equals(month_index)
+    assert list(updated.columns) == ["mean", "max"]
+    assert updated["mean"].tolist() == [0.0, 1.0, 20.0, 3.0, 22.0, 23.0, 24.0, 25.0]
+    assert updated["max"].tolist() == [1.0, 2.0, 30.0, 4.0, 32.0, 33.0, 34.0, 35.0]
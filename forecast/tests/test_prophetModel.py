@@ -0,0 +1,235 @@
+import concurrent.futures
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+import helper
+import prophetModel
+from prophetModel import ProphetTwilightValidator
+
+TZ_CHILE = pytz.timezone("America/Santiago")
+
+
+class _FakeTwilightTimes:
+    """Off-grid local sunrise/twilight times (like astroplan's), no ephemeris needed."""
+
+    @staticmethod
+    def from_day(day_str):
+        day = pd.Timestamp(day_str)
+        return SimpleNamespace(
+            sunrise_local=TZ_CHILE.localize(day + pd.Timedelta("07:04:13.4")),
+            evening_twilight_local=TZ_CHILE.localize(day + pd.Timedelta("21:13:27.4")),
+        )
+
+
+@pytest.fixture
+def rolling_df(monkeypatch):
+    monkeypatch.setattr(helper, "TwilightTimes", _FakeTwilightTimes)
+    index = pd.date_range("2025-01-01 03:00", "2025-01-06 02:45", freq="15min", tz="UTC")
+    hours = (index - index[0]) / pd.Timedelta(hours=1)
+    rng = np.random.default_rng(0)
+    mean = 12 + 5 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 0.2, len(index))
+    df = pd.DataFrame({"mean": mean, "min": mean - 0.5, "max": mean + 0.5}, index=index)
+    local = index.tz_convert(TZ_CHILE).tz_localize(None)
+    df["is_evening_twilight"] = (local.hour == 21) & (local.minute == 15)
+    df["is_morning_twilight"] = (local.hour == 7) & (local.minute == 0)
+    return df
+
+
+def test_evaluate_one_scores_off_grid_twilights(rolling_df):
+    val = ProphetTwilightValidator(rolling_df)
+    tw_time = val.twilight_times.iloc[3]
+    assert tw_time != tw_time.floor("15min")
+
+    merged = val._evaluate_one(tw_time, window_days=3, offset_hr=2)
+
+    # forecast rows sit on the data grid, so every one has an observation
+    assert (merged["ds"] == merged["ds"].dt.floor("15min")).all()
+    assert merged["ds"].min() == (tw_time - pd.Timedelta(hours=2)).ceil("15min")
+    assert merged["y"].notna().all()
+    assert np.isfinite(val.last_result.rmse)
+    assert np.isfinite(val.last_result.mae)
+
+
+def test_grid_sweep_over_off_grid_twilights_has_finite_metrics(rolling_df, monkeypatch):
+    # run the worker entry point in-process on every feasible twilight
+    monkeypatch.setattr(prophetModel, "_VAL", ProphetTwilightValidator(rolling_df))
+    rows = [prophetModel._one_eval((tw.isoformat(), 3, h))
+            for tw in prophetModel._VAL.twilight_times[2:]
+            for h in (0, 2)]
+
+    assert rows and all(r is not None for r in rows)
+    assert all(np.isfinite(r["rmse"]) and np.isfinite(r["mae"]) for r in rows)
+
+
+def test_evaluate_one_rejects_long_horizons_before_fitting(rolling_df, monkeypatch):
+    val = ProphetTwilightValidator(rolling_df)
+
+    def _no_fit(*args, **kwargs):
+        raise AssertionError("fit should have been skipped")
+
+    monkeypatch.setattr(val, "_train_prophet", _no_fit)
+    # offset 22 h + 3 h after twilight is a 25 h horizon
+    assert val._evaluate_one(val.twilight_times.iloc[4], window_days=3, offset_hr=22) is None
+    assert val.last_result is None
+
+
+def test_model_cache_reuses_a_fit_across_offsets(rolling_df, tmp_path, monkeypatch):
+    val = ProphetTwilightValidator(rolling_df, model_cache_dir=tmp_path / "models")
+    fits = []
+    fit_prophet = ProphetTwilightValidator._fit_prophet
+    monkeypatch.setattr(ProphetTwilightValidator, "_fit_prophet",
+                        staticmethod(lambda *a, **kw: fits.append(1) or fit_prophet(*a, **kw)))
+    train = val.df.iloc[:300]
+
+    first = val._train_prophet(train, offset_hour=0)
+    second = val._train_prophet(train, offset_hour=4)
+
+    assert len(fits) == 1
+    assert len(list((tmp_path / "models").glob("prophet_*.json"))) == 1
+    future = pd.DataFrame({"ds": pd.date_range(train["ds"].iloc[-1], periods=8, freq="15min")})
+    np.testing.assert_allclose(first.predict(future)["yhat"], second.predict(future)["yhat"])
+
+
+def test_prune_model_cache_keeps_newest(tmp_path):
+    for n in range(5):
+        path = tmp_path / f"prophet_{n}.json"
+        path.write_text("{}")
+        os.utime(path, (n, n))
+    (tmp_path / "other.json").write_text("{}")
+
+    prophetModel._prune_model_cache(tmp_path, keep=2)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "other.json", "prophet_3.json", "prophet_4.json"]
+
+
+def test_task_chunks_cover_tasks_in_order():
+    tasks = [("tw", w, h) for w in range(10) for h in range(7)]
+    chunks = prophetModel._task_chunks(tasks, max_workers=4)
+
+    assert len(chunks) == 14  # ceil(70 / 16) = 5 tasks per chunk
+    assert [k for chunk in chunks for k, _ in chunk] == list(range(70))
+    assert [t for chunk in chunks for _, t in chunk] == tasks
+    assert prophetModel._task_chunks(tasks[:3], max_workers=8) == [[(0, tasks[0])], [(1, tasks[1])],
+                                                                    [(2, tasks[2])]]
+
+
+class _InlineExecutor:
+    """Executor running the initializer and every task in this process."""
+
+    def __init__(self, max_workers, initializer, initargs):
+        initializer(*initargs)
+        self.n_submitted = 0
+
+    def submit(self, fn, *args):
+        self.n_submitted += 1
+        fut = concurrent.futures.Future()
+        fut.set_result(fn(*args))
+        return fut
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_run_grid_parallel_returns_rows_in_task_order(rolling_df, tmp_path, monkeypatch):
+    csv_path = tmp_path / "temps.csv"
+    rolling_df.rename_axis("timestamp").reset_index().to_csv(csv_path)
+    executors = []
+
+    def fake_executor(**kwargs):
+        executors.append(_InlineExecutor(**kwargs))
+        return executors[-1]
+
+    monkeypatch.setattr(prophetModel, "get_reusable_executor", fake_executor)
+    monkeypatch.setattr(prophetModel, "_EXECUTOR", None)
+    val = ProphetTwilightValidator(csv_path)
+    out = prophetModel.run_grid_parallel(val, window_grid=(3, 5), offset_grid=(0, 2, 23),
+                                         max_workers=2)
+
+    # offset 23 h is pruned (26 h horizon); the first two twilights are too early
+    n_tasks = (len(val.twilight_times) - 2) * 2 * 2
+    assert len(out) == n_tasks
+    assert executors[0].n_submitted == len(prophetModel._task_chunks(range(n_tasks), 2))
+    assert list(out["id"]) == list(range(n_tasks))
+    assert list(out["offset_hr"][:4]) == [0, 2, 0, 2]
+    assert list(out["window_days"][:4]) == [3, 3, 5, 5]
+    assert np.isfinite(out["rmse"]).all()
+
+
+def test_run_grid_parallel_needs_a_csv_backed_validator(rolling_df):
+    with pytest.raises(ValueError, match="CSV path"):
+        prophetModel.run_grid_parallel(ProphetTwilightValidator(rolling_df))
+
+
+def test_shutdown_grid_workers(monkeypatch):
+    calls = []
+    monkeypatch.setattr(prophetModel, "_EXECUTOR",
+                        SimpleNamespace(shutdown=lambda wait: calls.append(wait)))
+    prophetModel.shutdown_grid_workers()
+    prophetModel.shutdown_grid_workers()  # nothing left to shut down
+
+    assert calls == [True]
+    assert prophetModel._EXECUTOR is None
+
+
+def test_error_metrics_skip_missing_pairs():
+    y_true = np.array([1.0, 2.0, np.nan, 4.0, 5.0])
+    y_pred = np.array([1.5, np.nan, 3.0, 3.0, 7.0])
+    rmse, mae = ProphetTwilightValidator._error_metrics(y_true, y_pred)
+
+    d = np.array([-0.5, 1.0, -2.0])  # pairs with both values present
+    assert rmse == pytest.approx(np.sqrt(np.mean(d ** 2)))
+    assert mae == pytest.approx(np.mean(np.abs(d)))
+    assert np.isnan(ProphetTwilightValidator._error_metrics([np.nan], [1.0])).all()
+    assert np.isnan(ProphetTwilightValidator._error_metrics([], [])).all()
+
+
+def _fitted(n_delta=3, n_beta=4, shift=0.0):
+    # stands in for a fitted Prophet: MAP params as (1,) / (1, n) arrays
+    return SimpleNamespace(params={
+        "k": np.array([0.1 + shift]), "m": np.array([0.5]), "sigma_obs": np.array([0.05]),
+        "delta": np.full((1, n_delta), 0.01 + shift), "beta": np.full((1, n_beta), 0.2),
+    })
+
+
+def test_warm_start_round_trip(tmp_path):
+    path = tmp_path / "warm" / "start.json"
+    prophetModel.save_warm_start(path, _fitted(), n_history=96)
+
+    init = prophetModel.load_warm_start(path, n_delta=3, n_beta=4)
+    assert init == pytest.approx({"k": 0.1, "m": 0.5, "sigma_obs": 0.05,
+                                  "delta": [0.01] * 3, "beta": [0.2] * 4})
+    assert prophetModel.load_warm_start(path, n_delta=25, n_beta=4) is None
+    assert prophetModel.load_warm_start(path, n_delta=3, n_beta=8) is None
+    assert prophetModel.load_warm_start(tmp_path / "missing.json", 3, 4) is None
+    assert prophetModel.load_warm_start(None, 3, 4) is None
+    assert list(path.parent.iterdir()) == [path]  # no temp file left behind
+
+    path.write_text("{not json")
+    assert prophetModel.load_warm_start(path, n_delta=3, n_beta=4) is None
+
+
+def test_fit_warm_starts_from_the_previous_fit(rolling_df, tmp_path, monkeypatch):
+    inits = []
+
+    def fake_fit(train_df, cpoints, n_changepoints, uncertainty_samples=100, init=None,
+                 fourier_orders=(4, 4)):
+        inits.append(init)
+        return _fitted(n_delta=n_changepoints, n_beta=2 * sum(fourier_orders), shift=len(inits))
+
+    monkeypatch.setattr(ProphetTwilightValidator, "_fit_prophet", staticmethod(fake_fit))
+    validator = ProphetTwilightValidator(df=rolling_df, warm_start_path=tmp_path / "warm.json")
+    train_df = pd.DataFrame({"ds": pd.date_range("2025-01-01", periods=8, freq="15min"),
+                             "y": np.arange(8.0)})
+    validator._fit_warm(train_df, None, 5, (2, 2))
+    validator._fit_warm(train_df, None, 5, (2, 2))
+    validator._fit_warm(train_df, None, 6, (2, 2))  # changepoint count changed
+
+    assert inits[0] is None
+    assert inits[1]["k"] == pytest.approx(1.1) and len(inits[1]["delta"]) == 5
+    assert inits[2] is None
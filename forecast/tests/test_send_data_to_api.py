@@ -0,0 +1,119 @@
+import gzip
+import http.server
+import json
+import threading
+
+import pytest
+
+import send_data_to_api
+from helper import DataFileHandler
+
+CSV = "timestamp,tmean\n" + "".join(f"2025-01-01T00:{m:02d}:00-03:00,{m / 7:.2f}\n" for m in range(60))
+
+
+class _FakeSession:
+    def __init__(self, status_code=200, text="ok"):
+        self.status_code, self.text = status_code, text
+        self.posts = []
+
+    def post(self, url, data=None, headers=None):
+        self.posts.append({"url": url, "body": data.read(), "headers": headers})
+        return self
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    handler = DataFileHandler(base_dir=tmp_path)
+    handler.get_latest_path().write_text(CSV)
+    session = _FakeSession()
+    monkeypatch.setattr(send_data_to_api, "DataFileHandler", lambda: handler)
+    monkeypatch.setattr(send_data_to_api, "get_session", lambda: session)
+    return handler, session
+
+
+def test_upload_body_is_the_gzipped_csv(upload):
+    handler, session = upload
+    send_data_to_api.main()
+
+    (post,) = session.posts
+    assert post["headers"]["Content-Encoding"] == "gzip"
+    assert gzip.decompress(post["body"]).decode() == CSV
+    # nothing left next to the CSV or in the cache dir
+    assert sorted(p.name for p in handler.cache_dir.iterdir()) == []
+    assert not list(handler.base_dir.glob("*.gz"))
+
+
+
+def test_upload_sends_the_gzipped_length(upload):
+    _, session = upload
+    send_data_to_api.main()
+
+    (post,) = session.posts
+    assert int(post["headers"]["Content-Length"]) == len(post["body"])
+    assert "Transfer-Encoding" not in post["headers"]
+
+@pytest.fixture
+def failing_server():
+    """Local HTTP server answering every POST with 503 and an error body."""
+    hits = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            hits.append(self.rfile.read(int(self.headers["Content-Length"])))
+            body = b"worker overloaded"
+            self.send_response(503)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/update", hits
+    server.shutdown()
+
+
+def test_exhausted_retries_report_the_server_error(upload, failing_server, monkeypatch):
+    url, hits = failing_server
+    session = send_data_to_api.make_session(retries=2, backoff=0)
+    session.mount("http://", session.get_adapter("https://"))
+    monkeypatch.setattr(send_data_to_api, "URL", url)
+    monkeypatch.setattr(send_data_to_api, "get_session", lambda: session)
+
+    with pytest.raises(RuntimeError, match="503 worker overloaded"):
+        send_data_to_api.main()
+    assert len(hits) == 3  # first try + 2 retries, each with the full body
+    assert all(gzip.decompress(h).decode() == CSV for h in hits)
+
+
+def test_unchanged_csv_is_uploaded_once(upload):
+    handler, session = upload
+    send_data_to_api.main()
+    send_data_to_api.main()
+    assert len(session.posts) == 1
+
+    digest = send_data_to_api.file_digest(handler.get_latest_path())
+    assert (handler.base_dir / "upload_last_hash").read_text() == digest
+    (entry,) = [json.loads(line) for line in
+                (handler.base_dir / "upload_metadata.log").read_text().splitlines()]
+    assert entry["blake2b"] == digest and entry["status_code"] == 200
+    assert entry["size_bytes"] == len(CSV) and entry["gzip_bytes"] == len(session.posts[0]["body"])
+
+    handler.get_latest_path().write_text(CSV + "2025-01-01T01:00:00-03:00,9.99\n")
+    send_data_to_api.main()
+    assert len(session.posts) == 2
+
+
+def test_failed_upload_is_retried_on_the_next_run(upload):
+    handler, session = upload
+    session.status_code, session.text = 500, "boom"
+    with pytest.raises(RuntimeError, match="500 boom"):
+        send_data_to_api.main()
+    assert not (handler.base_dir / "upload_last_hash").exists()
+
+    session.status_code = 200
+    send_data_to_api.main()
+    assert len(session.posts) == 2
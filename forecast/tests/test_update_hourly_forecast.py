@@ -0,0 +1,80 @@
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import update_hourly_forecast
+from efd_temp_query import EFDTemperatureQuery
+from helper import DataFileHandler, write_timestamped_parquet
+
+NOW = datetime(2025, 1, 2, 10, 7, tzinfo=ZoneInfo("America/Santiago"))  # 13:07 UTC
+MIDNIGHT = NOW.replace(hour=0, minute=0)
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW.astimezone(tz)
+
+
+@pytest.fixture
+def hourly(tmp_path, monkeypatch, fake_twilight):
+    """Run main() at NOW against a temp handler; returns the handler and the EFD queries made."""
+    handler = DataFileHandler(base_dir=tmp_path)
+    queries = []
+
+    def fake_query_efd(self):
+        queries.append(self.start_date)
+        start = pd.Timestamp(self.start_date).tz_convert("UTC").floor("15min")
+        index = pd.date_range(start, pd.Timestamp(NOW).tz_convert("UTC"), freq="15min")
+        return pd.DataFrame({"mean": 100.0}, index=index)
+
+    monkeypatch.setattr(update_hourly_forecast, "datetime", _FrozenDatetime)
+    monkeypatch.setattr(update_hourly_forecast, "DataFileHandler", lambda: handler)
+    monkeypatch.setattr(EFDTemperatureQuery, "_query_efd", fake_query_efd)
+    return handler, queries
+
+
+def test_main_queries_the_whole_day_without_a_cache(hourly):
+    handler, queries = hourly
+    update_hourly_forecast.main()
+
+    assert queries == [MIDNIGHT.astimezone(ZoneInfo("UTC"))]
+    df = handler.read_cache_df(MIDNIGHT)
+    assert df.index[0] == pd.Timestamp(MIDNIGHT) and (df["mean"] == 100.0).all()
+
+
+def test_main_queries_only_from_the_last_filled_bin(hourly):
+    handler, queries = hourly
+    # cache filled up to 08:00 local, then NaN rows to the end of the day
+    index = pd.date_range(MIDNIGHT, periods=96, freq="15min").tz_convert("UTC")
+    cached = pd.DataFrame({"mean": np.where(np.arange(96) <= 32, np.arange(96.0), np.nan)},
+                          index=index)
+    cache_path = handler.get_daily_cache_path(MIDNIGHT)
+    write_timestamped_parquet(cached, cache_path)
+    os.utime(cache_path, (NOW.timestamp() - 3600,) * 2)  # written an hour ago
+
+    update_hourly_forecast.main()
+
+    assert queries == [index[32]]
+    df = handler.read_cache_df(MIDNIGHT)
+    assert df["mean"].iloc[:32].tolist() == list(np.arange(32.0))  # earlier bins from the cache
+    assert (df["mean"].iloc[32:41] == 100.0).all()                   # 08:00 (partial) .. 10:00 refetched
+    assert df["is_sunset"].sum() == 1
+
+
+def test_main_exits_early_when_the_cache_is_current(hourly, monkeypatch):
+    handler, queries = hourly
+    cache_path = handler.get_daily_cache_path(MIDNIGHT)
+    write_timestamped_parquet(pd.DataFrame({"mean": [1.0]}, index=[pd.Timestamp(MIDNIGHT)]),
+                              cache_path)
+    os.utime(cache_path, (NOW.timestamp() - 60,) * 2)  # within the 10:00 bin
+    monkeypatch.setattr(handler, "read_cache_df", lambda day: pytest.fail("cache was read"))
+
+    update_hourly_forecast.main()
+
+    assert queries == []
+    assert os.path.getmtime(cache_path) == NOW.timestamp() - 60
@@ -1,27 +1,53 @@
 #!/usr/bin/env python3
 from pathlib import Path
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
+import pandas as pd
 
-from efd_temp_query import EFDTemperatureQuery
 from helper import DataFileHandler
 
-# -- Get Chilean local midnight for today
-tz_chile = pytz.timezone("America/Santiago")
-now_chile = datetime.now(tz_chile)
-today_midnight = now_chile.replace(hour=0, minute=0, second=0, microsecond=0)
-tomorrow_midnight = today_midnight + timedelta(days=1)
-
-# -- Use DataFileHandler to get the daily cache file path
-handler = DataFileHandler()
-output_file = handler.get_daily_cache_path(today_midnight)
-
-print(f"Querying EFD from {today_midnight} to {tomorrow_midnight} (Chile local)")
-query = EFDTemperatureQuery(
-    start_date=today_midnight.astimezone(pytz.UTC),
-    end_date=tomorrow_midnight.astimezone(pytz.UTC),
-    freq="15min",
-    verbose=True
-)
-df = query.to_csv(output_file)
-print(f"✅ Wrote daily cache file: {output_file}")
\ No newline at end of file
+UTC = ZoneInfo("UTC")
+TZ_CHILE = ZoneInfo("America/Santiago")
+FREQ = "15min"
+
+def main():
+    # -- Get Chilean local midnight for today (zoneinfo resolves the offset of
+    #    each wall time, so midnights stay correct across DST changes)
+    now_chile = datetime.now(TZ_CHILE)
+    today_midnight = now_chile.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow_midnight = today_midnight + timedelta(days=1)
+
+    # -- Use DataFileHandler to get the daily cache file path
+    handler = DataFileHandler()
+    output_file = handler.get_daily_cache_path(today_midnight)
+
+    # -- Nothing new to fetch if the cache was already written during the
+    #    current 15-min bin; checked before importing the EFD client stack
+    bin_start = pd.Timestamp(now_chile).floor(FREQ)
+    if output_file.exists() and pd.Timestamp(output_file.stat().st_mtime, unit="s", tz="UTC") >= bin_start:
+        print(f"Daily cache already up to date for this {FREQ} bin: {output_file}")
+        return
+
+    from efd_temp_query import EFDTemperatureQuery
+
+    # -- Only query what today's cache doesn't have yet: from its last
+    #    filled 15-min bin (which may have been partial) onwards
+    cached = handler.read_cache_df(today_midnight) if output_file.exists() else pd.DataFrame()
+    last_filled = cached["mean"].last_valid_index() if not cached.empty else None
+    start = last_filled if last_filled is not None else today_midnight
+
+    print(f"Querying EFD from {start} to {tomorrow_midnight} (Chile local: {today_midnight.date()})")
+    query = EFDTemperatureQuery(
+        start_date=start.astimezone(UTC),
+        end_date=tomorrow_midnight.astimezone(UTC),
+        freq=FREQ,
+        verbose=True
+    )
+    # fresh values win; earlier bins come from the cache; flags are
+    # recomputed over the whole day so no event is flagged twice
+    df = query.fetch(cached=cached if last_filled is not None else None)
+    query.to_parquet(output_file, df=df)
+    print(f"✅ Wrote daily cache file: {output_file}")
+
+if __name__ == "__main__":
+    main()